@@ -0,0 +1,165 @@
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import click
+
+DEFAULT_DB = f"sqlite:///{Path(tempfile.gettempdir()) / 'numismatics-bench.db'}"
+
+reset_option = click.option(
+    "--reset", is_flag=True, help="Drop the database even if it holds data that was not seeded by the benchmarks."
+)
+
+
+@click.group()
+def main() -> None:
+    """Benchmarks for the numismatics API."""
+
+
+@main.command()
+@click.option("--db", default=DEFAULT_DB, show_default=True, help="Sync database URL, exported as FAST_DB.")
+@click.option("--async-db", default=None, help="Async database URL, exported as FAST_DB_ASYNC.")
+@click.option("--server", type=click.Choice(["asgi", "uvicorn"]), default="asgi", show_default=True)
+@click.option("--raw-json/--no-raw-json", default=False, show_default=True, help="Exported as FAST_RAW_JSON.")
+@click.option("--compression/--no-compression", default=True, show_default=True, help="Exported as FAST_COMPRESSION.")
+@click.option("--accounts", default=10, show_default=True)
+@click.option("--coins", default=10000, show_default=True)
+@click.option(
+    "--transfers", default=4000, show_default=True, help="Pending transfers, split between the scenarios closing them."
+)
+@click.option("--requests", default=200, show_default=True, help="Measured requests per scenario.")
+@click.option("--concurrency", default=10, show_default=True)
+@click.option("--warmup", default=10, show_default=True)
+@click.option("--scenario", "selected", multiple=True, help="Run only these scenarios.")
+@click.option("--output", type=click.Path(dir_okay=False, path_type=Path), default=None)
+@click.option("--baseline", type=click.Path(exists=True, dir_okay=False, path_type=Path), default=None)
+@click.option("--tolerance", default=0.2, show_default=True, help="Allowed relative regression against baseline.")
+@reset_option
+def run(
+    db: str,
+    async_db: str | None,
+    server: str,
+    raw_json: bool,
+    compression: bool,
+    accounts: int,
+    coins: int,
+    transfers: int,
+    requests: int,
+    concurrency: int,
+    warmup: int,
+    selected: tuple[str, ...],
+    output: Path | None,
+    baseline: Path | None,
+    tolerance: float,
+    reset: bool,
+) -> None:
+    """Seed a database, drive the API with every scenario and report latency percentiles as JSON."""
+
+    os.environ["FAST_DB"] = db
+    os.environ["FAST_RAW_JSON"] = "1" if raw_json else "0"
+    os.environ["FAST_COMPRESSION"] = "1" if compression else "0"
+    if async_db:
+        os.environ["FAST_DB_ASYNC"] = async_db
+
+    from numismatics.settings import engine_settings
+
+    from .runner import compare, run_in_process, run_uvicorn
+    from .scenarios import SCENARIOS
+    from .seed import seed
+
+    scenarios = {name: SCENARIOS[name] for name in selected or SCENARIOS}
+    fixture = seed(accounts, coins, transfers, reset=reset)
+    runner = run_uvicorn if server == "uvicorn" else run_in_process
+    results = runner(scenarios, fixture, requests=requests, concurrency=concurrency, warmup=warmup)
+    report = {
+        "config": {
+            "db": db.split("://")[0],
+            "async_db": async_db.split("://")[0] if async_db else None,
+            "server": server,
+            "raw_json": raw_json,
+            "compression": compression,
+            "accounts": accounts,
+            "coins": coins,
+            "transfers": transfers,
+            "requests": requests,
+            "concurrency": concurrency,
+            "engine": engine_settings.dict(),
+        },
+        "scenarios": results,
+    }
+    text = json.dumps(report, indent=2)
+    if output is not None:
+        output.write_text(text)
+
+    click.echo(text)
+    if baseline is not None and (
+        regressions := compare(results, json.loads(baseline.read_text())["scenarios"], tolerance)
+    ):
+        click.echo("\n".join(regressions), err=True)
+        sys.exit(1)
+
+
+@main.command("check-json")
+@click.option("--db", default=DEFAULT_DB, show_default=True, help="Sync database URL, exported as FAST_DB.")
+@click.option("--async-db", default=None, help="Async database URL, exported as FAST_DB_ASYNC.")
+@click.option("--accounts", default=3, show_default=True)
+@click.option("--coins", default=3000, show_default=True)
+@click.option("--transfers", default=300, show_default=True)
+@reset_option
+def check_json_command(db: str, async_db: str | None, accounts: int, coins: int, transfers: int, reset: bool) -> None:
+    """Check that FAST_RAW_JSON list responses are byte for byte equal to the pydantic ones."""
+
+    os.environ["FAST_DB"] = db
+    if async_db:
+        os.environ["FAST_DB_ASYNC"] = async_db
+
+    from .checks import check_json
+    from .seed import seed
+
+    if mismatches := check_json(seed(accounts, coins, transfers, reset=reset)):
+        click.echo("\n".join(mismatches), err=True)
+        sys.exit(1)
+
+    click.echo("raw JSON responses match")
+
+
+@main.command()
+@click.option("--db", default=DEFAULT_DB, show_default=True, help="Sync database URL, exported as FAST_DB.")
+@click.option("--accounts", default=3, show_default=True)
+@click.option("--coins", default=30000, show_default=True)
+@click.option("--transfers", default=1000, show_default=True)
+@click.option("--repeat", default=10, show_default=True, help="Requests per route and encoding.")
+@click.option("--raw-json/--no-raw-json", default=False, show_default=True, help="Exported as FAST_RAW_JSON.")
+@reset_option
+def compression(db: str, accounts: int, coins: int, transfers: int, repeat: int, raw_json: bool, reset: bool) -> None:
+    """Compare bytes saved against CPU spent for every supported response encoding."""
+
+    os.environ["FAST_DB"] = db
+    os.environ["FAST_RAW_JSON"] = "1" if raw_json else "0"
+    os.environ["FAST_COMPRESSION"] = "1"
+    os.environ.pop("FAST_DB_ASYNC", None)
+
+    from .compression import run_compression
+    from .seed import seed
+
+    click.echo(json.dumps(run_compression(seed(accounts, coins, transfers, reset=reset), repeat), indent=2))
+
+
+@main.command()
+@click.option("--number", default=2000, show_default=True, help="Calls per timing run.")
+@click.option("--repeat", default=5, show_default=True, help="Timing runs; the fastest one is reported.")
+@click.option("--coins", default=100, show_default=True)
+def statements(number: int, repeat: int, coins: int) -> None:
+    """Time the sql.py helpers with cached statements and with statements rebuilt on every call."""
+
+    os.environ.setdefault("FAST_DB", "sqlite://")
+
+    from .statements import run_statements
+
+    click.echo(json.dumps(run_statements(number, repeat, coins), indent=2))
+
+
+if __name__ == "__main__":
+    main()
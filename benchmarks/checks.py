@@ -0,0 +1,73 @@
+import asyncio
+import json
+from collections.abc import Iterator
+
+import httpx
+
+from .seed import Fixture
+
+UNICODE_COIN = {
+    "description": "Рубль ½ — «пробный» ü",
+    "nominal_price": 1,
+    "release_year": "1913",
+    "serial_number": "ÜNICODE-1",
+    "type_money": 1,
+    "currency": 1,
+    "mint": 1,
+    "issuing_state": 1,
+}
+
+
+def get_list_calls(fixture: Fixture) -> Iterator[tuple[str, str]]:
+    user = fixture.users[0]
+    yield user, "/money/?limit=1000"
+    yield user, "/money/?limit=7&order_by=-nominal_price,release_year"
+    yield user, "/money/search?limit=20&q=coin"
+    yield user, "/transfer/?limit=1000"
+    yield fixture.admin, "/money/all?limit=1000"
+    yield fixture.admin, "/money/all?limit=25&order_by=release_year,-id"
+    yield fixture.admin, "/transfer/?limit=1000"
+    yield fixture.admin, "/account/?limit=1000"
+    yield fixture.admin, "/currency/?limit=3"
+
+
+def check_json(fixture: Fixture, pages: int = 3) -> list[str]:
+    """Request every list route with and without FAST_RAW_JSON and report responses that differ by a byte."""
+
+    from numismatics import env
+    from numismatics.app import app
+
+    async def fetch(client: httpx.AsyncClient, user: str, url: str, raw_json: bool) -> list[bytes]:
+        env.RAW_JSON = raw_json
+        bodies = []
+        for _ in range(pages):
+            response = await client.get(url, auth=(user, ""))
+            response.raise_for_status()
+            bodies.append(response.content)
+            if (cursor := response.json()["next_cursor"]) is None:
+                break
+
+            url = str(httpx.URL(url).copy_merge_params({"cursor": cursor}))
+
+        return bodies
+
+    async def run() -> list[str]:
+        mismatches = []
+        # as in the runner, shutdown disposes the engines, whose async connections belong to this event loop
+        await app.router.startup()
+        try:
+            async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=None) as client:
+                response = await client.post("/money/", auth=(fixture.users[0], ""), json=UNICODE_COIN)
+                response.raise_for_status()
+                for user, url in get_list_calls(fixture):
+                    expected, actual = await fetch(client, user, url, False), await fetch(client, user, url, True)
+                    if not json.loads(expected[0])["items"]:
+                        mismatches.append(f"{url} as {user}: empty list, nothing to compare")
+                    elif expected != actual:
+                        mismatches.append(f"{url} as {user}: raw JSON differs from the pydantic response")
+        finally:
+            await app.router.shutdown()
+
+        return mismatches
+
+    return asyncio.run(run())
@@ -0,0 +1,60 @@
+import asyncio
+from collections.abc import Iterator
+from time import perf_counter, process_time
+from typing import Any
+
+import httpx
+
+from .seed import Fixture
+
+
+def get_calls(fixture: Fixture) -> Iterator[tuple[str, str]]:
+    yield fixture.users[0], "/money/upload"
+    yield fixture.users[1], "/money/upload?order_by=-nominal_price"
+    yield fixture.users[0], "/money/?limit=1000"
+    yield fixture.admin, "/transfer/?limit=1000"
+
+
+def run_compression(fixture: Fixture, repeat: int) -> dict[str, dict[str, dict[str, Any]]]:
+    """Fetch each route with every encoding and report bytes on the wire against CPU time per request.
+
+    Client and server share the process, so `cpu_ms` includes the client side, which is the same for every encoding;
+    `extra_cpu_ms` is the difference to the uncompressed response.
+    """
+
+    from numismatics.app import app
+    from numismatics.compression import get_encodings
+
+    async def fetch(client: httpx.AsyncClient, user: str, url: str, encoding: str) -> tuple[int, float, float]:
+        size, started, cpu_started = 0, perf_counter(), process_time()
+        for _ in range(repeat):
+            headers = {"Accept-Encoding": encoding}
+            async with client.stream("GET", url, auth=(user, ""), headers=headers) as response:
+                response.raise_for_status()
+                size = sum([len(chunk) async for chunk in response.aiter_raw()])
+
+        return size, (perf_counter() - started) / repeat, (process_time() - cpu_started) / repeat
+
+    async def run() -> dict[str, dict[str, dict[str, Any]]]:
+        report: dict[str, dict[str, dict[str, Any]]] = {}
+        async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=None) as client:
+            for user, url in get_calls(fixture):
+                results = report[f"{url} as {user}"] = {}
+                await fetch(client, user, url, "identity")
+                identity_size, identity_cpu = 0, 0.0
+                for encoding in ["identity", *get_encodings()]:
+                    size, elapsed, cpu = await fetch(client, user, url, encoding)
+                    if encoding == "identity":
+                        identity_size, identity_cpu = size, cpu
+
+                    results[encoding] = {
+                        "bytes": size,
+                        "ratio": round(size / identity_size, 3),
+                        "mean_ms": round(elapsed * 1000, 3),
+                        "cpu_ms": round(cpu * 1000, 3),
+                        "extra_cpu_ms": round((cpu - identity_cpu) * 1000, 3),
+                    }
+
+        return report
+
+    return asyncio.run(run())
@@ -0,0 +1,147 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from statistics import mean, quantiles
+from time import perf_counter
+from typing import Any
+
+import httpx
+
+from .scenarios import Scenario
+from .seed import Fixture
+
+
+async def run_scenario(
+    client: httpx.AsyncClient, scenario: Scenario, fixture: Fixture, requests: int, concurrency: int
+) -> dict[str, float]:
+    latencies: list[float] = []
+    errors = 0
+    indexes = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in indexes:
+            if (call := scenario(fixture, i)) is None:
+                return
+
+            started = perf_counter()
+            response = await client.request(
+                call.method, call.url, auth=(call.user, ""), json=call.json, headers=call.headers
+            )
+            latencies.append(perf_counter() - started)
+            errors += response.is_error
+
+    started = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, perf_counter() - started)
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict[str, float]:
+    if len(latencies) < 2:
+        return {"requests": len(latencies), "errors": errors}
+
+    percentiles = quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": round(len(latencies) / elapsed, 2),
+        "mean_ms": round(mean(latencies) * 1000, 3),
+        "p50_ms": round(percentiles[49] * 1000, 3),
+        "p95_ms": round(percentiles[94] * 1000, 3),
+        "p99_ms": round(percentiles[98] * 1000, 3),
+    }
+
+
+async def run_scenarios(
+    client: httpx.AsyncClient,
+    scenarios: dict[str, Scenario],
+    fixture: Fixture,
+    requests: int,
+    concurrency: int,
+    warmup: int,
+) -> dict[str, dict[str, float]]:
+    results = {}
+    for name, scenario in scenarios.items():
+        await run_scenario(client, scenario, fixture, warmup, concurrency)
+        results[name] = await run_scenario(client, scenario, fixture, requests, concurrency)
+
+    return results
+
+
+def run_in_process(scenarios: dict[str, Scenario], fixture: Fixture, **options: Any) -> dict[str, dict[str, float]]:
+    from numismatics.app import app
+
+    async def run() -> dict[str, dict[str, float]]:
+        # the ASGI transport skips the lifespan, so startup and shutdown run here; shutdown disposes the engines,
+        # without it the aiosqlite thread keeps the process alive
+        await app.router.startup()
+        try:
+            async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=None) as client:
+                return await run_scenarios(client, scenarios, fixture, **options)
+        finally:
+            await app.router.shutdown()
+
+    return asyncio.run(run())
+
+
+def run_uvicorn(scenarios: dict[str, Scenario], fixture: Fixture, **options: Any) -> dict[str, dict[str, float]]:
+    async def run(base_url: str) -> dict[str, dict[str, float]]:
+        limits = httpx.Limits(max_connections=options["concurrency"])
+        async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+            return await run_scenarios(client, scenarios, fixture, **options)
+
+    with uvicorn_server() as base_url:
+        return asyncio.run(run(base_url))
+
+
+@contextmanager
+def uvicorn_server(startup_timeout: float = 30) -> Iterator[str]:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    command = [sys.executable, "-m", "uvicorn", "numismatics.app:app", "--port", str(port), "--log-level", "warning"]
+    process = subprocess.Popen(command, env=os.environ.copy(), stdout=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("uvicorn did not start")
+
+                time.sleep(0.1)
+
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def compare(results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]], tolerance: float) -> list[str]:
+    regressions = []
+    for name, base in baseline.items():
+        if (result := results.get(name)) is None or "p95_ms" not in base:
+            continue
+
+        if "p95_ms" not in result:
+            regressions.append(f"{name}: {result['requests']} measured requests, the scenario ran out of data")
+            continue
+
+        if result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']} ms > baseline {base['p95_ms']} ms")
+
+        if result["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {result['throughput']} rps < baseline {base['throughput']} rps")
+
+        if result["errors"] > base["errors"]:
+            regressions.append(f"{name}: {result['errors']} errors > baseline {base['errors']}")
+
+    return regressions
@@ -0,0 +1,129 @@
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from numismatics import sql
+from numismatics.models import Transfer
+
+from .seed import Fixture
+
+
+@dataclass
+class Call:
+    method: str
+    url: str
+    user: str
+    json: Any = None
+    headers: dict[str, str] | None = None
+
+
+Scenario = Callable[[Fixture, int], Call | None]
+
+# a token past every change, as held by a client that is up to date
+caught_up_token = sql.encode_cursor([(Transfer.change_seq, "+")], [2**62])
+
+
+def get_user(fixture: Fixture, i: int) -> str:
+    return fixture.users[i % len(fixture.users)]
+
+
+def list_money(fixture: Fixture, i: int) -> Call:
+    return Call("GET", "/money/?limit=100", get_user(fixture, i))
+
+
+def poll_money(fixture: Fixture, i: int) -> Call:
+    # `*` matches any current page, so every call takes the 304 revalidation path
+    return Call("GET", "/money/?limit=100", get_user(fixture, i), headers={"If-None-Match": "*"})
+
+
+def get_money(fixture: Fixture, i: int) -> Call:
+    user = get_user(fixture, i)
+    coins = fixture.coins[user]
+    return Call("GET", f"/money/{coins[i // len(fixture.users) % len(coins)]}", user)
+
+
+def search_money(fixture: Fixture, i: int) -> Call:
+    queries = [f"coin {i * 7919 % 100000}", f"SN{i * 7919 % 100000:08d}", f"SN{i % 1000:05d}"]
+    return Call("GET", f"/money/search?limit=20&q={queries[i % len(queries)]}", get_user(fixture, i))
+
+
+def money_stats(fixture: Fixture, i: int) -> Call:
+    fields = ["type_money", "currency", "mint", "issuing_state", "release_year"]
+    return Call("GET", f"/money/stats?group_by={fields[i % len(fields)]}", get_user(fixture, i))
+
+
+def upload_collection(fixture: Fixture, i: int) -> Call:
+    return Call("GET", "/money/upload?order_by=-nominal_price", get_user(fixture, i))
+
+
+def create_money(fixture: Fixture, i: int) -> Call:
+    scheme = {
+        "description": f"bench coin {i}",
+        "nominal_price": i % 1000 + 1,
+        "release_year": "2000",
+        "serial_number": f"BENCH{i:08d}",
+        "type_money": 1,
+        "currency": 1,
+        "mint": 1,
+        "issuing_state": 1,
+    }
+    return Call("POST", "/money/", get_user(fixture, i), scheme)
+
+
+def create_transfer(fixture: Fixture, i: int) -> Call | None:
+    user = get_user(fixture, i)
+    if not fixture.free_coins[user]:
+        return None
+
+    destination = fixture.users[(fixture.users.index(user) + 1) % len(fixture.users)]
+    scheme = {
+        "source": fixture.user_ids[user],
+        "destination": fixture.user_ids[destination],
+        "comment": "bench",
+        "money": fixture.free_coins[user].pop(),
+    }
+    return Call("POST", "/transfer/", fixture.admin, scheme)
+
+
+def close_transfer(action: str) -> Scenario:
+    def close(fixture: Fixture, i: int) -> Call | None:
+        user = get_user(fixture, i)
+        if not (pending := fixture.transfers[f"{action}_transfer"][user]):
+            return None
+
+        return Call("POST", f"/transfer/{action}/{pending.pop()}", user)
+
+    return close
+
+
+def poll_transfer_changes(fixture: Fixture, i: int) -> Call:
+    return Call("GET", f"/transfer/changes?since={caught_up_token}", get_user(fixture, i))
+
+
+def close_transfers(action: str, size: int = 50) -> Scenario:
+    def close(fixture: Fixture, i: int) -> Call | None:
+        user = get_user(fixture, i)
+        if not (pending := fixture.transfers[f"{action}_transfers"][user]):
+            return None
+
+        ids = [pending.pop() for _ in range(min(size, len(pending)))]
+        return Call("POST", f"/transfer/{action}", user, ids)
+
+    return close
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "list_money": list_money,
+    "poll_money": poll_money,
+    "get_money": get_money,
+    "search_money": search_money,
+    "money_stats": money_stats,
+    "upload_collection": upload_collection,
+    "create_money": create_money,
+    "create_transfer": create_transfer,
+    "approve_transfer": close_transfer("approve"),
+    "decline_transfer": close_transfer("decline"),
+    "approve_transfers": close_transfers("approve"),
+    "decline_transfers": close_transfers("decline"),
+    "poll_transfer_changes": poll_transfer_changes,
+}
@@ -0,0 +1,118 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from random import Random
+
+import click
+from sqlalchemy import insert, inspect, select
+
+from numismatics import stats
+from numismatics.db import SessionFactory, engine
+from numismatics.db_scheme import create_all, drop_all
+from numismatics.models import Account, BaseModel, Currency, IssuingState, Mint, Money, Transfer, TypeMoney
+from numismatics.types import StatusTransfer
+
+ADMIN = "bench-admin"
+CATALOG_SIZE = 10
+CHUNK_SIZE = 5000
+# every scenario closing transfers gets its own pending ones, so the scenarios run earlier cannot use them up
+TRANSFER_POOLS = ("approve_transfer", "decline_transfer", "approve_transfers", "decline_transfers")
+
+
+@dataclass
+class Fixture:
+    admin: str
+    users: list[str]
+    user_ids: dict[str, int]
+    coins: dict[str, list[int]]
+    free_coins: dict[str, list[int]]
+    transfers: dict[str, dict[str, list[int]]] = field(default_factory=dict)
+
+
+def seed(accounts: int, coins: int, transfers: int, seed_value: int = 0, reset: bool = False) -> Fixture:
+    """Recreate the schema and fill it; a database with other data than an earlier seed is dropped only with
+    `reset`."""
+
+    if not reset and not is_disposable():
+        raise click.ClickException(
+            f"{engine.url.render_as_string()} holds data that was not seeded by the benchmarks; "
+            "point --db at a dedicated database or pass --reset to drop it"
+        )
+
+    random = Random(seed_value)
+    drop_all()
+    create_all()
+    with SessionFactory() as session, session.begin():
+        users = [f"collector{i}" for i in range(accounts)]
+        session.execute(insert(Account), [{"name": ADMIN, "is_admin": True}] + [{"name": name} for name in users])
+        for model in (TypeMoney, Currency, Mint, IssuingState):
+            session.execute(insert(model), [{} for _ in range(CATALOG_SIZE)])
+
+        user_ids = dict(session.execute(select(Account.name, Account.id)).tuples().all())
+        for start in range(0, coins, CHUNK_SIZE):
+            session.execute(
+                insert(Money),
+                [
+                    {
+                        "description": f"coin {i}",
+                        "nominal_price": random.randint(1, 1000),
+                        "release_year": str(random.randint(1700, 2023)),
+                        "serial_number": f"SN{i:08d}",
+                        "user": user_ids[users[i % accounts]],
+                        "type_money": random.randint(1, CATALOG_SIZE),
+                        "currency": random.randint(1, CATALOG_SIZE),
+                        "mint": random.randint(1, CATALOG_SIZE),
+                        "issuing_state": random.randint(1, CATALOG_SIZE),
+                    }
+                    for i in range(start, min(start + CHUNK_SIZE, coins))
+                ],
+            )
+
+        owners = {user_id: name for name, user_id in user_ids.items()}
+        fixture = Fixture(ADMIN, users, user_ids, {name: [] for name in users}, {name: [] for name in users})
+        for money_id, user_id in session.execute(select(Money.id, Money.user).order_by(Money.id)):
+            fixture.coins[owners[user_id]].append(money_id)
+
+        transferred = [(name, coin) for name in users for coin in fixture.coins[name][: transfers // accounts + 1]]
+        pending = [
+            {
+                "source": user_ids[name],
+                "destination": user_ids[users[(users.index(name) + 1) % accounts]],
+                "creater": user_ids[ADMIN],
+                "created_at": datetime.now(timezone.utc),
+                "comment": "bench",
+                "money": coin,
+                "status": StatusTransfer.initial,
+            }
+            for name, coin in transferred[:transfers]
+        ]
+        if pending:
+            session.execute(insert(Transfer), pending)
+
+        taken = {coin for _, coin in transferred[:transfers]}
+        for name in users:
+            fixture.free_coins[name] = [coin for coin in fixture.coins[name] if coin not in taken]
+
+        stats.rebuild(session)
+        fixture.transfers = {pool: {name: [] for name in users} for pool in TRANSFER_POOLS}
+        for i, (transfer_id, destination) in enumerate(
+            session.execute(select(Transfer.id, Transfer.destination).order_by(Transfer.id))
+        ):
+            fixture.transfers[TRANSFER_POOLS[i % len(TRANSFER_POOLS)]][owners[destination]].append(transfer_id)
+
+    return fixture
+
+
+def is_disposable() -> bool:
+    """The database is empty or was filled by `seed`."""
+
+    with engine.connect() as connection:
+        existing_tables = set(inspect(connection).get_table_names())
+        if Account.__tablename__ in existing_tables:
+            if connection.scalar(select(Account.id).where(Account.name == ADMIN)) is not None:
+                return True
+
+        return all(
+            connection.scalar(select(1).select_from(table).limit(1)) is None
+            for table in BaseModel.metadata.sorted_tables
+            if table.name in existing_tables
+        )
@@ -0,0 +1,103 @@
+import timeit
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any
+from unittest import mock
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from numismatics import sql
+from numismatics.api import MoneyResolver, TransferResolver
+from numismatics.cache import AccountSnapshot
+from numismatics.models import Account, BaseModel, Currency, IssuingState, Mint, Money, Transfer, TypeMoney
+from numismatics.schemes import PaginationScheme
+from numismatics.types import StatusTransfer
+
+CACHED_STATEMENTS = ("get_filtered_statement", "get_instance_statement", "get_all_statement")
+
+
+@contextmanager
+def rebuilt_statements() -> Iterator[None]:
+    """Build every statement from scratch on each call, the way the helpers worked before caching."""
+
+    with mock.patch.multiple(sql, **{name: getattr(sql, name).__wrapped__ for name in CACHED_STATEMENTS}):
+        yield
+
+
+def make_session(coins: int) -> Session:
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    BaseModel.metadata.create_all(engine)
+    session = Session(engine)
+    session.execute(insert(Account), [{"name": "owner"}, {"name": "receiver"}])
+    for model in (TypeMoney, Currency, Mint, IssuingState):
+        session.execute(insert(model), [{}])
+
+    coin = {"nominal_price": 1, "release_year": "2000", "type_money": 1, "currency": 1, "mint": 1, "issuing_state": 1}
+    session.execute(
+        insert(Money),
+        [{**coin, "description": f"coin {i}", "serial_number": f"SN{i}", "user": 1} for i in range(coins)],
+    )
+    session.execute(
+        insert(Transfer),
+        [
+            {
+                "source": 1,
+                "destination": 2,
+                "creater": 1,
+                "created_at": datetime.now(timezone.utc),
+                "comment": "bench",
+                "money": 1,
+                "status": StatusTransfer.initial,
+            }
+        ],
+    )
+    session.commit()
+    return session
+
+
+def get_cases(session: Session) -> dict[str, Callable[[], Any]]:
+    money_resolver, transfer_resolver = MoneyResolver(), TransferResolver()
+    owner = AccountSnapshot(1, "owner", False, None)
+    receiver = AccountSnapshot(2, "receiver", False, None)
+    account, money = session.get(Account, 1), session.get(Money, 1)
+    assert account is not None and money is not None
+    pagination = PaginationScheme(limit=10)
+
+    return {
+        "money_by_id": lambda: sql.get_instance_by_id(session, 1, Money, money_resolver.get_filtration(owner)),
+        "money_for_update": lambda: sql.get_instance_by_id(session, 1, Money, sql.FOR_UPDATE),
+        "transfer_by_id": lambda: sql.get_instance_by_id(
+            session, 1, Transfer, transfer_resolver.get_filtration(receiver)
+        ),
+        "transfers_by_source": lambda: sql.get_all_instance(
+            session, Transfer, transfer_resolver.get_filtration_by_source(account, money)
+        ),
+        "money_page": lambda: sql.get_page(session, Money, pagination, money_resolver.get_filtration(owner)),
+    }
+
+
+def measure(call: Callable[[], Any], number: int, repeat: int) -> float:
+    return min(timeit.repeat(call, number=number, repeat=repeat)) / number * 1e6
+
+
+def run_statements(number: int, repeat: int, coins: int) -> dict[str, dict[str, float]]:
+    """Microseconds per helper call against in-memory SQLite, where Python overhead dominates."""
+
+    session = make_session(coins)
+    results = {}
+    for name, call in get_cases(session).items():
+        call()
+        with rebuilt_statements():
+            rebuilt = measure(call, number, repeat)
+
+        cached = measure(call, number, repeat)
+        results[name] = {
+            "rebuilt_us": round(rebuilt, 1),
+            "cached_us": round(cached, 1),
+            "saved_us": round(rebuilt - cached, 1),
+        }
+
+    return results
@@ -1,40 +1,97 @@
+import asyncio
 import csv
 import http
-from collections import Counter
-from collections.abc import Sequence
+from collections.abc import AsyncIterator, Iterable, Iterator, Sequence
 from datetime import datetime, timezone
-from io import StringIO
-from typing import Any, Generic, TypeVar
-
-from fastapi import APIRouter, Depends, FastAPI, Request
-from fastapi.responses import JSONResponse, StreamingResponse
-from sqlalchemy import select
+from io import BytesIO, StringIO, TextIOWrapper
+from itertools import chain, islice
+from time import monotonic
+from typing import Any, BinaryIO, Generic, TypeVar
+
+import orjson
+from fastapi import APIRouter, Depends, FastAPI, Header, Query, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import Row, bindparam, func, insert, literal, select, text, update
 from sqlalchemy.orm import Session
-from sqlalchemy.sql.expression import asc, desc, literal_column
-
-from . import sql
-from .depends import get_current_user, get_filters, get_ordering, get_session, get_super_user
+from sqlalchemy.sql.expression import asc, desc
+
+from . import env, etags, exports, fulltext, notify, sql, stats
+from .cache import AccountSnapshot, catalog_cache, on_commit, principal_cache
+from .db import SessionFactory
+from .depends import (
+    get_current_user,
+    get_filters,
+    get_ordering,
+    get_session,
+    get_streaming_user,
+    get_super_user,
+    iterate_in_session,
+    transactional,
+)
 from .errors import (
     BaseError,
+    ExportNotReadyError,
+    InvalidEncodingError,
+    LockedError,
     MissingObjectsError,
     OwnerMismatchError,
     SelfTransferError,
     UnauthorizedError,
     UndefinedError,
     UniqueError,
+    UnsupportedFormatError,
+)
+from .models import (
+    Account,
+    BaseModel,
+    Catalog,
+    Currency,
+    ExportJob,
+    IssuingState,
+    Mint,
+    Money,
+    Transfer,
+    TypeMoney,
+    transfer_destination_lock,
+)
+from .models_schemes import (
+    AccountModelScheme,
+    BaseModelScheme,
+    BatchItemScheme,
+    ExportJobModelScheme,
+    ImportErrorScheme,
+    ImportReportScheme,
+    MoneyModelScheme,
+    MoneyStatsScheme,
+    PageScheme,
+    TransferChangeScheme,
+    TransferChangesScheme,
+    TransferModelScheme,
 )
-from .middleware import session_middleware
-from .models import Account, BaseModel, Catalog, Currency, IssuingState, Mint, Money, Transfer, TypeMoney
-from .models_schemes import AccountModelScheme, BaseModelScheme, MoneyModelScheme, TransferModelScheme
 from .schemes import (
     BaseScheme,
     CatalogScheme,
+    CountMode,
+    CreateMoneyBatchScheme,
     CreateMoneyScheme,
     CreateTransferScheme,
+    ExportFormat,
     FiltrationScheme,
+    ImportMoneyScheme,
     NewAccountScheme,
+    PaginationScheme,
+    StatsField,
+    TransferIdsScheme,
 )
-from .types import StatusTransfer
+from .types import StatusExport, StatusTransfer
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # optional, only needed for Arrow exports
+    pyarrow = None
 
 CatalogRequestSchemeT = TypeVar("CatalogRequestSchemeT", bound=CatalogScheme)
 RequestSchemeT = TypeVar("RequestSchemeT", bound=BaseScheme)
@@ -64,7 +121,6 @@ class CrudResolver(Generic[ResponseSchemeT, ModelT]):
 
     def connect_with_app(self, prefix: str, app: FastAPI) -> None:
         app.include_router(self.get_router(), prefix=prefix, responses=errors_responses[401])
-        app.middleware("http")(session_middleware)
         app.exception_handler(BaseError)(self.base_exception_handler)
         app.exception_handler(UnauthorizedError)(self.unauthorized_exception_handler)
 
@@ -75,34 +131,105 @@ class CrudResolver(Generic[ResponseSchemeT, ModelT]):
 
     def connect_resolvers(self, router: APIRouter) -> None:
         response_scheme = self.response_scheme
-        router.get("/", response_model=Sequence[response_scheme])(self.get_all)
-        router.get("/{obj_id}", response_model=response_scheme, responses=errors_responses[422])(self.get_by_id)
-        router.delete("/{obj_id}", responses=errors_responses[422])(self.delete_by_id)
+        router.get("/", response_model=PageScheme[response_scheme])(transactional(self.get_all))
+        router.get("/{obj_id}", response_model=response_scheme, responses=errors_responses[422])(
+            transactional(self.get_by_id)
+        )
+        router.delete("/{obj_id}", responses=errors_responses[422])(transactional(self.delete_by_id))
 
     def get_all(
-        self, session: Session = Depends(get_session), user: Account = Depends(get_current_user)
-    ) -> Sequence[ModelT]:
-        return sql.get_all_instance(session, self.model, self.get_filtration(user))
+        self,
+        response: Response,
+        pagination: PaginationScheme = Depends(),
+        if_none_match: str | None = Header(None),
+        session: Session = Depends(get_session),
+        user: AccountSnapshot = Depends(get_current_user),
+    ) -> sql.Page[ModelT] | Response:
+        return self.get_page(session, response, pagination, self.get_filtration(user), if_none_match=if_none_match)
 
     def get_by_id(
-        self, obj_id: int, session: Session = Depends(get_session), user: Account = Depends(get_current_user)
-    ) -> ModelT:
-        return self.get_instance_by_id(session, obj_id, user)
+        self,
+        obj_id: int,
+        response: Response,
+        if_none_match: str | None = Header(None),
+        session: Session = Depends(get_session),
+        user: AccountSnapshot = Depends(get_current_user),
+    ) -> ModelT | Response:
+        return self.respond_with_etag(self.get_instance_by_id(session, obj_id, user), response, if_none_match)
 
     def delete_by_id(
-        self, obj_id: int, session: Session = Depends(get_session), user: Account = Depends(get_super_user)
+        self, obj_id: int, session: Session = Depends(get_session), user: AccountSnapshot = Depends(get_super_user)
     ) -> None:
         obj = self.get_instance_by_id(session, obj_id, user)
         obj.deleted_at = datetime.now(timezone.utc)
 
-    def get_instance_by_id(self, session: Session, obj_id: int, user: Account) -> ModelT:
+    def get_instance_by_id(self, session: Session, obj_id: int, user: AccountSnapshot) -> ModelT:
         obj = sql.get_instance_by_id(session, obj_id, self.model, self.get_filtration(user))
         if obj is None:
             raise UndefinedError("undefined")
 
         return obj
 
-    def get_filtration(self, user: Account) -> sql.OneModelFiltration[sql.OneModelStatement[ModelT]] | None:
+    def respond_with_etag(self, obj: ModelT, response: Response, if_none_match: str | None) -> ModelT | Response:
+        etag = self.get_etag(obj)
+        if etags.matches(if_none_match, etag):
+            return etags.not_modified(etag, response)
+
+        response.headers["ETag"] = etag
+        return obj
+
+    def get_etag(self, obj: ModelT) -> str:
+        return etags.make_etag(obj.id, obj.version)
+
+    def get_page(
+        self,
+        session: Session,
+        response: Response,
+        pagination: PaginationScheme,
+        filtration: sql.OneModelFiltration[sql.OneModelStatement[ModelT]] | None = None,
+        order_by: dict[str, Any] | None = None,
+        if_none_match: str | None = None,
+    ) -> sql.Page[ModelT] | Response:
+        if if_none_match is not None:
+            # revalidation reads only ids and versions, the full rows are loaded once the page has changed
+            versions = sql.get_rows_page(session, self.model, etags.VERSION_COLUMNS, pagination, filtration, order_by)
+            if etags.matches(if_none_match, etag := etags.get_page_etag(versions)):
+                return etags.not_modified(etag, response)
+
+        if pagination.count is not None:
+            response.headers["X-Total-Count"] = str(self.count(session, pagination.count, filtration))
+
+        if not env.RAW_JSON:
+            page = sql.get_page(session, self.model, pagination, filtration, order_by)
+            response.headers["ETag"] = etags.get_page_etag(page)
+            return page
+
+        columns = [*self.response_scheme.__fields__, "version"]
+        rows_page = sql.get_rows_page(session, self.model, columns, pagination, filtration, order_by)
+        response.headers["ETag"] = etags.get_page_etag(rows_page)
+        return self.dump_page(rows_page, response)
+
+    def dump_page(self, page: sql.Page[Sequence[Any]], response: Response) -> ORJSONResponse:
+        """Encode rows ordered like the response scheme fields without building pydantic models."""
+
+        fields = list(self.response_scheme.__fields__)
+        return ORJSONResponse(
+            {"items": [dict(zip(fields, row)) for row in page.items], "next_cursor": page.next_cursor},
+            headers=dict(response.headers),
+        )
+
+    def count(
+        self,
+        session: Session,
+        mode: CountMode,
+        filtration: sql.OneModelFiltration[sql.OneModelStatement[ModelT]] | None = None,
+    ) -> int:
+        if mode == "estimate":
+            return sql.estimate_rows(session, self.model, filtration)
+
+        return sql.count_rows(session, self.model, filtration)
+
+    def get_filtration(self, user: AccountSnapshot) -> sql.OneModelFiltration[sql.OneModelStatement[ModelT]] | None:
         return None
 
     def base_exception_handler(self, request: Request, exc: BaseError) -> JSONResponse:
@@ -126,15 +253,67 @@ class CatalogResolver(Generic[CatalogRequestSchemeT, ResponseSchemeT, ModelT], C
         super().__init__(response_scheme, model)
 
     def connect_resolvers(self, router: APIRouter) -> None:
-        router.post("/", response_model=self.response_scheme)(self.create)
+        router.post("/", response_model=self.response_scheme)(transactional(self.create))
         super().connect_resolvers(router)
 
-    def create(self, session: Session = Depends(get_session), admin: Account = Depends(get_super_user)) -> ModelT:
+    def create(
+        self, session: Session = Depends(get_session), admin: AccountSnapshot = Depends(get_super_user)
+    ) -> ModelT:
         obj = self.model()
         session.add(obj)
         session.flush()
+        catalog_cache.invalidate_on_commit(session, self.model)
         return obj
 
+    def get_all(
+        self,
+        response: Response,
+        pagination: PaginationScheme = Depends(),
+        if_none_match: str | None = Header(None),
+        session: Session = Depends(get_session),
+        user: AccountSnapshot = Depends(get_current_user),
+    ) -> sql.Page[ModelT] | Response:
+        sort_keys = sql.get_sort_keys(self.model, {})
+        after = None if pagination.cursor is None else sql.decode_cursor(pagination.cursor, sort_keys)[0]
+        ids = catalog_cache.get_page_ids(session, self.model, after, pagination.limit + 1)
+        page_ids = ids[: pagination.limit]
+        next_cursor = None if len(ids) <= pagination.limit else sql.encode_cursor(sort_keys, [page_ids[-1]])
+        etag = etags.make_etag(page_ids, next_cursor, weak=True)
+        if etags.matches(if_none_match, etag):
+            return etags.not_modified(etag, response)
+
+        response.headers["ETag"] = etag
+        if pagination.count is not None:
+            response.headers["X-Total-Count"] = str(len(catalog_cache.get_ids(session, self.model)))
+
+        if env.RAW_JSON:
+            return self.dump_page(sql.Page([(obj_id,) for obj_id in page_ids], next_cursor), response)
+
+        return sql.Page([self.model(id=obj_id) for obj_id in page_ids], next_cursor)
+
+    def get_by_id(
+        self,
+        obj_id: int,
+        response: Response,
+        if_none_match: str | None = Header(None),
+        session: Session = Depends(get_session),
+        user: AccountSnapshot = Depends(get_current_user),
+    ) -> ModelT | Response:
+        if not catalog_cache.contains(session, self.model, obj_id):
+            raise UndefinedError("undefined")
+
+        return self.respond_with_etag(self.model(id=obj_id), response, if_none_match)
+
+    def get_etag(self, obj: ModelT) -> str:
+        # catalog entries are served from the id cache and have no other fields
+        return etags.make_etag(obj.id)
+
+    def delete_by_id(
+        self, obj_id: int, session: Session = Depends(get_session), user: AccountSnapshot = Depends(get_super_user)
+    ) -> None:
+        super().delete_by_id(obj_id, session, user)
+        catalog_cache.invalidate_on_commit(session, self.model)
+
 
 class CrudUpdateResolver(Generic[RequestSchemeT, ResponseSchemeT, ModelT], CrudResolver[ResponseSchemeT, ModelT]):
     def __init__(
@@ -144,15 +323,17 @@ class CrudUpdateResolver(Generic[RequestSchemeT, ResponseSchemeT, ModelT], CrudR
         super().__init__(response_scheme, model)
 
     def connect_resolvers(self, router: APIRouter) -> None:
-        router.post("/", response_model=self.response_scheme)(self.create)
-        router.post("/{obj_id}", response_model=self.response_scheme, responses=errors_responses[422])(self.update)
+        router.post("/", response_model=self.response_scheme)(transactional(self.create))
+        router.post("/{obj_id}", response_model=self.response_scheme, responses=errors_responses[422])(
+            transactional(self.update)
+        )
         super().connect_resolvers(router)
 
     def create(
         self,
         scheme: RequestSchemeT,
         session: Session = Depends(get_session),
-        user: Account = Depends(get_current_user),
+        user: AccountSnapshot = Depends(get_current_user),
     ) -> ModelT:
         raise NotImplementedError()
 
@@ -160,7 +341,7 @@ class CrudUpdateResolver(Generic[RequestSchemeT, ResponseSchemeT, ModelT], CrudR
         self,
         scheme: RequestSchemeT,
         session: Session,
-        user: Account,
+        user: AccountSnapshot,
     ) -> ModelT:
         self.validate(session, scheme)
         obj = self.model(**scheme.dict(), **self.get_new_instance_fields(user))
@@ -173,7 +354,7 @@ class CrudUpdateResolver(Generic[RequestSchemeT, ResponseSchemeT, ModelT], CrudR
         obj_id: int,
         scheme: RequestSchemeT,
         session: Session = Depends(get_session),
-        user: Account = Depends(get_current_user),
+        user: AccountSnapshot = Depends(get_current_user),
     ) -> ModelT:
         raise NotImplementedError()
 
@@ -182,7 +363,7 @@ class CrudUpdateResolver(Generic[RequestSchemeT, ResponseSchemeT, ModelT], CrudR
         obj_id: int,
         scheme: RequestSchemeT,
         session: Session = Depends(get_session),
-        user: Account = Depends(get_current_user),
+        user: AccountSnapshot = Depends(get_current_user),
     ) -> ModelT:
         self.validate(session, scheme)
         obj = self.get_instance_by_id(session, obj_id, user)
@@ -191,7 +372,7 @@ class CrudUpdateResolver(Generic[RequestSchemeT, ResponseSchemeT, ModelT], CrudR
 
         return obj
 
-    def get_new_instance_fields(self, user: Account) -> dict[str, Any]:
+    def get_new_instance_fields(self, user: AccountSnapshot) -> dict[str, Any]:
         return {}
 
     def validate(self, session: Session, scheme: RequestSchemeT) -> None:
@@ -205,96 +386,378 @@ class MoneyResolver(CrudUpdateResolver[CreateMoneyScheme, MoneyModelScheme, Mone
         "mint": Mint,
         "issuing_state": IssuingState,
     }
+    export_chunk_size = 1000
+    export_media_types: dict[str, str] = {
+        "csv": "text/csv",
+        "ndjson": "application/x-ndjson",
+        "arrow": "application/vnd.apache.arrow.stream",
+    }
+    import_chunk_size = 5000
+    import_errors_limit = 100
+    # cells past the header are collected under this key, the line is rejected
+    import_extra_cells = "extra_cells"
 
     def __init__(self) -> None:
         super().__init__(CreateMoneyScheme, MoneyModelScheme, Money)
 
     def connect_resolvers(self, router: APIRouter) -> None:
-        router.get("/all", response_model=Sequence[MoneyModelScheme])(self.get_all_money_for_super_user)
-        router.get("/upload", response_model=Sequence[MoneyModelScheme])(self.upload_collection)
+        router.get("/all", response_model=PageScheme[MoneyModelScheme])(
+            transactional(self.get_all_money_for_super_user)
+        )
+        router.get("/search", response_model=PageScheme[MoneyModelScheme])(transactional(self.search))
+        router.get("/stats", response_model=list[MoneyStatsScheme])(transactional(self.get_stats))
+        router.get("/stats/all", response_model=list[MoneyStatsScheme])(transactional(self.get_stats_for_super_user))
+        router.get("/upload", response_model=Sequence[MoneyModelScheme])(transactional(self.upload_collection))
+        router.post("/exports", response_model=ExportJobModelScheme)(transactional(self.create_export))
+        router.get("/exports/{obj_id}", response_model=ExportJobModelScheme, responses=errors_responses[422])(
+            transactional(self.get_export)
+        )
+        router.get("/exports/{obj_id}/file", responses=errors_responses[422])(transactional(self.download_export))
+        router.post("/batch", response_model=list[BatchItemScheme[MoneyModelScheme]])(transactional(self.create_batch))
+        router.post("/import", response_model=ImportReportScheme, responses=errors_responses[422])(
+            transactional(self.import_collection)
+        )
         super().connect_resolvers(router)
 
     def create(
         self,
         scheme: CreateMoneyScheme,
         session: Session = Depends(get_session),
-        user: Account = Depends(get_current_user),
+        user: AccountSnapshot = Depends(get_current_user),
     ) -> Money:
         return super().create_model(scheme, session, user)
 
+    def create_batch(
+        self,
+        schemes: CreateMoneyBatchScheme,
+        session: Session = Depends(get_session),
+        user: AccountSnapshot = Depends(get_current_user),
+    ) -> list[dict[str, Any]]:
+        missing_keys = self.validate_batch(session, schemes)
+        values = [
+            {**scheme.dict(), **self.get_new_instance_fields(user)}
+            for scheme, missing in zip(schemes, missing_keys)
+            if not missing
+        ]
+        # RETURNING does not promise the order of the input rows, so rows are matched to inputs by their values;
+        # equal inputs make equal rows and may take any of them
+        created: dict[tuple[Any, ...], list[Money]] = {}
+        for money in session.scalars(insert(self.model).returning(self.model), values).all() if values else ():
+            created.setdefault(tuple(getattr(money, field) for field in values[0]), []).append(money)
+
+        stats.track(session, values)
+        rows = iter(values)
+        return [
+            (
+                {"error": MissingObjectsError.__name__, "fields": missing}
+                if missing
+                else {"item": created[tuple(next(rows).values())].pop(0)}
+            )
+            for missing in missing_keys
+        ]
+
+    def import_collection(
+        self,
+        file: UploadFile,
+        keep_user: bool = False,
+        session: Session = Depends(get_session),
+        user: AccountSnapshot = Depends(get_current_user),
+    ) -> ImportReportScheme:
+        if keep_user and not user.is_admin:
+            raise UnauthorizedError("no admin")
+
+        report = ImportReportScheme()
+        columns = [field for field in MoneyModelScheme.__fields__ if field != "id"]
+        sql.bulk_insert(session, self.model, columns, self.read_csv(file.file, keep_user, session, user, report))
+        return report
+
+    def read_csv(
+        self, file: BinaryIO, keep_user: bool, session: Session, user: AccountSnapshot, report: ImportReportScheme
+    ) -> Iterator[list[dict[str, Any]]]:
+        reader = csv.DictReader(
+            TextIOWrapper(file, encoding="utf-8", newline=""), restkey=self.import_extra_cells, dialect=csv.excel
+        )
+        rows = enumerate(reader, start=2)
+        try:
+            while chunk := list(islice(rows, self.import_chunk_size)):
+                yield self.validate_import(chunk, keep_user, session, user, report)
+        except UnicodeDecodeError:
+            raise InvalidEncodingError() from None
+
+    def validate_import(
+        self,
+        rows: Sequence[tuple[int, dict[str, Any]]],
+        keep_user: bool,
+        session: Session,
+        user: AccountSnapshot,
+        report: ImportReportScheme,
+    ) -> list[dict[str, Any]]:
+        lines, schemes = [], []
+        for line, row in rows:
+            if self.import_extra_cells in row:
+                self.reject_import(report, line, ValidationError.__name__, [self.import_extra_cells])
+                continue
+
+            # without keep_user the file's owner column is ignored, whatever it holds
+            if not keep_user:
+                row = {**row, "user": user.id}
+
+            try:
+                scheme = ImportMoneyScheme.parse_obj(row)
+            except ValidationError as exc:
+                self.reject_import(
+                    report, line, exc.__class__.__name__, [str(error["loc"][0]) for error in exc.errors()]
+                )
+                continue
+
+            lines.append(line)
+            schemes.append(scheme)
+
+        existing_users = {user.id}
+        if keep_user and schemes:
+            stmt = select(Account.id).where(
+                Account.id.in_({scheme.user for scheme in schemes}), sql.get_filter_by_existing(Account)
+            )
+            existing_users = set(session.scalars(stmt))
+
+        values = []
+        for line, scheme, missing in zip(lines, schemes, self.validate_batch(session, schemes)):
+            if scheme.user not in existing_users:
+                missing.append("user")
+
+            if missing:
+                self.reject_import(report, line, MissingObjectsError.__name__, missing)
+            else:
+                values.append(scheme.dict())
+
+        report.accepted += len(values)
+        stats.track(session, values)
+        return values
+
+    def reject_import(self, report: ImportReportScheme, line: int, error: str, fields: list[str]) -> None:
+        report.rejected += 1
+        if len(report.errors) < self.import_errors_limit:
+            report.errors.append(ImportErrorScheme(line=line, error=error, fields=fields))
+
     def update(
         self,
         obj_id: int,
         scheme: CreateMoneyScheme,
         session: Session = Depends(get_session),
-        user: Account = Depends(get_current_user),
+        user: AccountSnapshot = Depends(get_current_user),
     ) -> Money:
         return super().update_model(obj_id, scheme, session, user)
 
+    def get_all(
+        self,
+        response: Response,
+        pagination: PaginationScheme = Depends(),
+        order_by: dict[str, Any] = Depends(get_ordering),
+        if_none_match: str | None = Header(None),
+        session: Session = Depends(get_session),
+        user: AccountSnapshot = Depends(get_current_user),
+    ) -> sql.Page[Money] | Response:
+        return self.get_page(session, response, pagination, self.get_filtration(user), order_by, if_none_match)
+
     def get_all_money_for_super_user(
-        self, session: Session = Depends(get_session), user: Account = Depends(get_super_user)
-    ) -> Sequence[Money]:
-        return sql.get_all_instance(session, self.model)
+        self,
+        response: Response,
+        pagination: PaginationScheme = Depends(),
+        order_by: dict[str, Any] = Depends(get_ordering),
+        if_none_match: str | None = Header(None),
+        session: Session = Depends(get_session),
+        user: AccountSnapshot = Depends(get_super_user),
+    ) -> sql.Page[Money] | Response:
+        return self.get_page(session, response, pagination, order_by=order_by, if_none_match=if_none_match)
+
+    def count(
+        self,
+        session: Session,
+        mode: CountMode,
+        filtration: sql.OneModelFiltration[sql.OneModelStatement[Money]] | None = None,
+    ) -> int:
+        # the owner filter is exactly what the maintained statistics count
+        if filtration is not None and filtration.criteria == self.filter_by_owner:
+            return stats.count_coins(session, filtration.params["user_id"])
+
+        return super().count(session, mode, filtration)
+
+    def search(
+        self,
+        response: Response,
+        q: str = Query(min_length=1, max_length=100),
+        pagination: PaginationScheme = Depends(),
+        session: Session = Depends(get_session),
+        user: AccountSnapshot = Depends(get_current_user),
+    ) -> sql.Page[Row[Any]] | ORJSONResponse:
+        columns = list(self.response_scheme.__fields__)
+        page = fulltext.search_page(session, q, columns, pagination, self.get_filtration(user))
+        return self.dump_page(page, response) if env.RAW_JSON else page
+
+    def get_stats(
+        self,
+        group_by: StatsField,
+        session: Session = Depends(get_session),
+        user: AccountSnapshot = Depends(get_current_user),
+    ) -> list[dict[str, Any]]:
+        return stats.get_groups(session, group_by, user.id)
+
+    def get_stats_for_super_user(
+        self,
+        group_by: StatsField,
+        session: Session = Depends(get_session),
+        user: AccountSnapshot = Depends(get_super_user),
+    ) -> list[dict[str, Any]]:
+        return stats.get_groups(session, group_by)
 
     def get_by_id(
-        self, obj_id: int, session: Session = Depends(get_session), user: Account = Depends(get_current_user)
-    ) -> Money:
+        self,
+        obj_id: int,
+        response: Response,
+        if_none_match: str | None = Header(None),
+        session: Session = Depends(get_session),
+        user: AccountSnapshot = Depends(get_current_user),
+    ) -> Money | Response:
         if user.is_admin:
-            return super().get_by_id(obj_id, session, user)
+            return super().get_by_id(obj_id, response, if_none_match, session, user)
 
-        return self.get_instance_by_id(session, obj_id, user)
+        return self.respond_with_etag(self.get_instance_by_id(session, obj_id, user), response, if_none_match)
 
     def delete_by_id(
-        self, obj_id: int, session: Session = Depends(get_session), user: Account = Depends(get_current_user)
+        self, obj_id: int, session: Session = Depends(get_session), user: AccountSnapshot = Depends(get_current_user)
     ) -> None:
         super().delete_by_id(obj_id, session, user)
 
     def upload_collection(
         self,
+        export_format: ExportFormat = Query("csv", alias="format"),
         order_by: dict[str, Any] = Depends(get_ordering),
         filters: dict[str, Any] = Depends(get_filters(FiltrationScheme)),
         session: Session = Depends(get_session),
-        user: Account = Depends(get_current_user),
+        user: AccountSnapshot = Depends(get_current_user),
     ) -> StreamingResponse:
+        dump = self.get_dumper(export_format)
         converters = {"+": asc, "-": desc}
-        stmt = sql.select_and_filter(self.model, self.get_filtration(user)).filter_by(**filters)
+        headers = list(MoneyModelScheme.__fields__.keys())
+        filtration = self.get_filtration(user)
+        stmt = sql.select_and_filter(self.model, filtration).filter_by(**filters)
         if order_by:
             stmt = stmt.order_by(None).order_by(*[converters[sort](field) for field, sort in order_by.items()])
 
-        money = session.scalars(stmt).all()
-        return self.dump_csv(money, list(MoneyModelScheme.__fields__.keys()))
+        stmt = stmt.with_only_columns(*[getattr(self.model, field) for field in headers])
+        rows = sql.stream_partitions(session, stmt, self.export_chunk_size, sql.get_params(filtration))
+        return StreamingResponse(
+            iterate_in_session(dump(rows, headers)),
+            media_type=self.export_media_types[export_format],
+            headers={"Content-Disposition": f"filename=money.{export_format}"},
+        )
+
+    def create_export(
+        self,
+        export_format: ExportFormat = Query("csv", alias="format"),
+        order_by: dict[str, Any] = Depends(get_ordering),
+        filters: dict[str, Any] = Depends(get_filters(FiltrationScheme)),
+        session: Session = Depends(get_session),
+        user: AccountSnapshot = Depends(get_current_user),
+    ) -> ExportJob:
+        """Same file as `/upload`, written by an export worker; the job is only started once it is committed."""
+
+        dump = self.get_dumper(export_format)
+        job = exports.create_job(session, user.id, export_format, filters, order_by)
+        headers = list(MoneyModelScheme.__fields__.keys())
+        on_commit(session, lambda: exports.submit(job.id, dump, headers, self.export_chunk_size))
+        return job
+
+    def get_export(
+        self, obj_id: int, session: Session = Depends(get_session), user: AccountSnapshot = Depends(get_current_user)
+    ) -> ExportJob:
+        filtration = sql.OneModelFiltration(exports.filter_by_user, {"user_id": user.id})
+        if (job := sql.get_instance_by_id(session, obj_id, ExportJob, filtration)) is None:
+            raise UndefinedError("undefined")
+
+        return job
+
+    def download_export(
+        self,
+        obj_id: int,
+        range_header: str | None = Header(None, alias="range"),
+        if_range: str | None = Header(None),
+        session: Session = Depends(get_session),
+        user: AccountSnapshot = Depends(get_current_user),
+    ) -> Response:
+        job = self.get_export(obj_id, session, user)
+        if job.status != StatusExport.done:
+            raise ExportNotReadyError(job.status)
+
+        if not (path := exports.get_path(job)).exists():
+            raise UndefinedError("purged")
+
+        return exports.get_file_response(path, self.export_media_types[job.format], range_header, if_range)
 
-    def dump_csv(self, data: Sequence[Money], headers: Sequence[str]) -> StreamingResponse:
+    def get_dumper(self, export_format: str) -> exports.Dumper:
+        if export_format == "arrow" and pyarrow is None:
+            raise UnsupportedFormatError(export_format)
+
+        dumpers: dict[str, exports.Dumper] = {
+            "csv": self.dump_csv,
+            "ndjson": self.dump_ndjson,
+            "arrow": self.dump_arrow,
+        }
+        return dumpers[export_format]
+
+    def dump_csv(self, partitions: Iterable[Sequence[Any]], headers: Sequence[str]) -> Iterator[str]:
         buffer_file = StringIO()
         writer = csv.writer(buffer_file, dialect=csv.excel)
-        writer.writerow(headers)
-        writer.writerows([getattr(money, r) for r in headers] for money in data)
-        buffer_file.seek(0)
-        return StreamingResponse(
-            buffer_file, media_type="text/csv", headers={"Content-Disposition": "filename=money.csv"}
+        for rows in chain([[headers]], partitions):
+            writer.writerows(rows)
+            yield buffer_file.getvalue()
+            buffer_file.seek(0)
+            buffer_file.truncate()
+
+    def dump_ndjson(self, partitions: Iterable[Sequence[Any]], headers: Sequence[str]) -> Iterator[bytes]:
+        for rows in partitions:
+            yield b"".join(orjson.dumps(dict(zip(headers, row)), option=orjson.OPT_APPEND_NEWLINE) for row in rows)
+
+    def dump_arrow(self, partitions: Iterable[Sequence[Any]], headers: Sequence[str]) -> Iterator[bytes]:
+        """One record batch per partition in the Arrow IPC streaming format, with the integer columns kept as int64."""
+
+        buffer_file = BytesIO()
+        schema = self.get_arrow_schema(headers)
+        with pyarrow.ipc.new_stream(buffer_file, schema) as writer:
+            for rows in partitions:
+                columns = [pyarrow.array(column, field.type) for column, field in zip(zip(*rows), schema)]
+                writer.write_batch(pyarrow.RecordBatch.from_arrays(columns, schema=schema))
+                yield buffer_file.getvalue()
+                buffer_file.seek(0)
+                buffer_file.truncate()
+
+        yield buffer_file.getvalue()
+
+    def get_arrow_schema(self, headers: Sequence[str]) -> "pyarrow.Schema":
+        types = {int: pyarrow.int64(), str: pyarrow.string()}
+        return pyarrow.schema(
+            [pyarrow.field(field, types[getattr(self.model, field).type.python_type], False) for field in headers]
         )
 
-    def get_new_instance_fields(self, user: Account) -> dict[str, Any]:
+    def get_new_instance_fields(self, user: AccountSnapshot) -> dict[str, Any]:
         return {"user": user.id}
 
-    def get_filtration(self, user: Account) -> sql.OneModelFiltration[sql.OneModelStatement[Money]] | None:
-        def accesse_filter(stmt: sql.OneModelStatement[Money]) -> sql.OneModelStatement[Money]:
-            return stmt.where(Money.user == user.id)
+    def get_filtration(self, user: AccountSnapshot) -> sql.OneModelFiltration[sql.OneModelStatement[Money]] | None:
+        return sql.OneModelFiltration(self.filter_by_owner, {"user_id": user.id})
 
-        return accesse_filter
+    def filter_by_owner(self, stmt: sql.OneModelStatement[Money]) -> sql.OneModelStatement[Money]:
+        return stmt.where(self.model.user == bindparam("user_id"))
 
     def validate(self, session: Session, scheme: CreateMoneyScheme) -> None:
-        fk_select = [
-            select(literal_column(f"'{attr}'")).where(
-                model.id == getattr(scheme, attr), sql.get_filter_by_existing(model)
-            )
-            for attr, model in self.fields.items()
-        ]
-        stmt_by_tabls = fk_select[0].union_all(*fk_select[1:])
-        existing = session.scalars(stmt_by_tabls).all()
+        if missing_keys := self.validate_batch(session, [scheme])[0]:
+            raise MissingObjectsError(missing_keys)
 
-        if missing_keys := Counter(self.fields.keys()) - Counter(existing):
-            raise MissingObjectsError(list(missing_keys))
+    def validate_batch(self, session: Session, schemes: Sequence[CreateMoneyScheme]) -> list[list[str]]:
+        missing_ids = {
+            attr: catalog_cache.get_missing(session, model, {getattr(scheme, attr) for scheme in schemes})
+            for attr, model in self.fields.items()
+        }
+        return [[attr for attr, ids in missing_ids.items() if getattr(scheme, attr) in ids] for scheme in schemes]
 
 
 class AccountResolver(CrudUpdateResolver[NewAccountScheme, AccountModelScheme, Account]):
@@ -302,14 +765,28 @@ class AccountResolver(CrudUpdateResolver[NewAccountScheme, AccountModelScheme, A
         super().__init__(NewAccountScheme, AccountModelScheme, Account)
 
     def connect_resolvers(self, router: APIRouter) -> None:
-        router.get("/me", response_model=AccountModelScheme)(get_current_user)
+        router.get("/me", response_model=AccountModelScheme)(self.get_me)
         super().connect_resolvers(router)
 
+    def get_me(
+        self,
+        response: Response,
+        if_none_match: str | None = Header(None),
+        user: AccountSnapshot = Depends(get_current_user),
+    ) -> AccountSnapshot | Response:
+        # the snapshot comes from the principal cache, so a revalidation usually runs no SQL at all
+        etag = etags.make_etag(user.id, user.name, user.is_admin)
+        if etags.matches(if_none_match, etag):
+            return etags.not_modified(etag, response)
+
+        response.headers["ETag"] = etag
+        return user
+
     def create(
         self,
         scheme: NewAccountScheme,
         session: Session = Depends(get_session),
-        user: Account = Depends(get_super_user),
+        user: AccountSnapshot = Depends(get_super_user),
     ) -> Account:
         return super().create_model(scheme, session, user)
 
@@ -318,9 +795,17 @@ class AccountResolver(CrudUpdateResolver[NewAccountScheme, AccountModelScheme, A
         obj_id: int,
         scheme: NewAccountScheme,
         session: Session = Depends(get_session),
-        user: Account = Depends(get_super_user),
+        user: AccountSnapshot = Depends(get_super_user),
     ) -> Account:
-        return super().update_model(obj_id, scheme, session, user)
+        account = super().update_model(obj_id, scheme, session, user)
+        principal_cache.invalidate_on_commit(session, obj_id)
+        return account
+
+    def delete_by_id(
+        self, obj_id: int, session: Session = Depends(get_session), user: AccountSnapshot = Depends(get_super_user)
+    ) -> None:
+        super().delete_by_id(obj_id, session, user)
+        principal_cache.invalidate_on_commit(session, obj_id)
 
     def validate(self, session: Session, scheme: NewAccountScheme) -> None:
         stmt = select(self.model).where(self.model.name == scheme.name, sql.get_filter_by_existing(self.model))
@@ -334,18 +819,29 @@ class TransferResolver(CrudResolver[TransferModelScheme, Transfer]):
 
     def __init__(self) -> None:
         super().__init__(TransferModelScheme, Transfer)
+        self.changes_sort_keys: sql.SortKeys = [(Transfer.change_seq, "+")]
 
     def connect_resolvers(self, router: APIRouter) -> None:
-        router.post("/", response_model=TransferModelScheme)(self.create_transfer)
-        router.post("/approve/{{obj_id}}", response_model=MoneyModelScheme)(self.approve)
-        router.post("/decline/{{obj_id}}")(self.decline)
+        router.post("/", response_model=TransferModelScheme)(transactional(self.create_transfer))
+        router.post("/approve", response_model=list[BatchItemScheme[MoneyModelScheme]])(
+            transactional(self.approve_batch)
+        )
+        router.post("/decline", response_model=list[BatchItemScheme[TransferModelScheme]])(
+            transactional(self.decline_batch)
+        )
+        router.get("/changes", response_model=TransferChangesScheme, responses=errors_responses[422])(
+            transactional(self.get_changes)
+        )
+        router.get("/stream", response_class=StreamingResponse, responses=errors_responses[422])(self.stream)
+        router.post("/approve/{obj_id}", response_model=MoneyModelScheme)(transactional(self.approve))
+        router.post("/decline/{obj_id}")(transactional(self.decline))
         super().connect_resolvers(router)
 
     def create_transfer(
         self,
         scheme: CreateTransferScheme,
         session: Session = Depends(get_session),
-        user: Account = Depends(get_super_user),
+        user: AccountSnapshot = Depends(get_super_user),
     ) -> Transfer:
         source, destination, money = self.validate_transfer(scheme, session)
         transfer = Transfer(
@@ -358,23 +854,25 @@ class TransferResolver(CrudResolver[TransferModelScheme, Transfer]):
             status=StatusTransfer.initial,
         )
         session.add(transfer)
-        session.flush()
+        self.publish_changes(session, [transfer])
         return transfer
 
     def approve(
         self,
         obj_id: int,
         session: Session = Depends(get_session),
-        user: Account = Depends(get_current_user),
+        user: AccountSnapshot = Depends(get_current_user),
     ) -> Money:
         transfer = self.get_instance_by_id(session, obj_id, user)
-        money = sql.get_instance_by_id(session, transfer.money, Money, lambda stmt: stmt.with_for_update())
+        money = sql.get_instance_by_id(session, transfer.money, Money, sql.FOR_UPDATE)
         if money and money.user == transfer.source:
-            return self.move_money(transfer, money, user)
+            self.move_money(transfer, money, user)
+            self.publish_changes(session, [transfer])
+            return money
 
         raise MissingObjectsError(transfer.money)
 
-    def move_money(self, transfer: Transfer, money: Money, user: Account) -> Money:
+    def move_money(self, transfer: Transfer, money: Money, user: AccountSnapshot) -> Money:
         transfer.closed_at = datetime.now(timezone.utc)
         transfer.status = StatusTransfer.approved
         money.user = user.id
@@ -384,38 +882,216 @@ class TransferResolver(CrudResolver[TransferModelScheme, Transfer]):
         self,
         obj_id: int,
         session: Session = Depends(get_session),
-        user: Account = Depends(get_current_user),
+        user: AccountSnapshot = Depends(get_current_user),
     ) -> None:
         transfer = self.get_instance_by_id(session, obj_id, user)
         transfer.closed_at = datetime.now(timezone.utc)
         transfer.status = StatusTransfer.declined
+        self.publish_changes(session, [transfer])
 
-    def get_filtration(self, user: Account) -> sql.OneModelFiltration[sql.OneModelStatement[Transfer]] | None:
-        def accesse_filter(stmt: sql.OneModelStatement[Transfer]) -> sql.OneModelStatement[Transfer]:
-            stmt = stmt.where(self.model.status == StatusTransfer.initial)
-            if user.is_admin:
-                return stmt
+    def approve_batch(
+        self,
+        ids: TransferIdsScheme,
+        session: Session = Depends(get_session),
+        user: AccountSnapshot = Depends(get_current_user),
+    ) -> list[dict[str, Any]]:
+        transfers, results = self.lock_transfers(session, ids, user)
+        coins, locked_coins = sql.lock_instances(session, Money, {transfer.money for transfer in transfers.values()})
+        approved = []
+        for transfer in transfers.values():
+            if (money := coins.get(transfer.money)) is not None and money.user == transfer.source:
+                approved.append(transfer)
+                results[transfer.id] = {"item": money}
+            else:
+                error = LockedError if transfer.money in locked_coins else MissingObjectsError
+                results[transfer.id] = {"error": error.__name__}
+
+        if approved:
+            self.move_money_batch(session, approved, [coins[transfer.money] for transfer in approved], user)
+
+        return [results[obj_id] for obj_id in ids]
+
+    def move_money_batch(
+        self, session: Session, transfers: Sequence[Transfer], coins: Sequence[Money], user: AccountSnapshot
+    ) -> None:
+        # set-based updates bypass the flush, so the statistics are moved to the new owner here
+        old_values = [stats.get_values(money) for money in coins]
+        stats.track(session, old_values, -1)
+        stats.track(session, [{**values, "user": user.id} for values in old_values])
+        session.execute(update(Money).where(Money.id.in_([money.id for money in coins])).values(user=user.id))
+        self.close_batch(session, transfers, StatusTransfer.approved)
+
+    def decline_batch(
+        self,
+        ids: TransferIdsScheme,
+        session: Session = Depends(get_session),
+        user: AccountSnapshot = Depends(get_current_user),
+    ) -> list[dict[str, Any]]:
+        transfers, results = self.lock_transfers(session, ids, user)
+        if transfers:
+            self.close_batch(session, list(transfers.values()), StatusTransfer.declined)
 
-            return stmt.where(self.model.destination == user.id)
+        results.update({obj_id: {"item": transfer} for obj_id, transfer in transfers.items()})
+        return [results[obj_id] for obj_id in ids]
 
-        return accesse_filter
+    def get_changes(
+        self,
+        response: Response,
+        since: str | None = None,
+        limit: int = Query(100, ge=1, le=1000),
+        session: Session = Depends(get_session),
+        user: AccountSnapshot = Depends(get_current_user),
+    ) -> dict[str, Any] | Response:
+        """Transfers to the user created, closed or deleted after the `since` token, oldest change first."""
+
+        after = 0 if since is None else sql.decode_cursor(since, self.changes_sort_keys)[0]
+        changes = self.read_changes(session, user.id, after, limit + 1)
+        if not changes:
+            return Response(status_code=http.HTTPStatus.NO_CONTENT, headers=response.headers)
+
+        items = changes[:limit]
+        return {"items": items, "token": self.get_token(items[-1].change_seq), "has_more": len(changes) > limit}
+
+    def read_changes(self, session: Session, destination: int, after: int, limit: int) -> Sequence[Transfer]:
+        # a single range scan of the (destination, change_seq) index, so an empty poll is one probe
+        stmt = (
+            select(self.model)
+            .where(self.model.destination == bindparam("destination_id"), self.model.change_seq > bindparam("after"))
+            .order_by(self.model.change_seq)
+            .limit(bindparam("limit"))
+        )
+        return session.scalars(stmt, {"destination_id": destination, "after": after, "limit": limit}).all()
+
+    async def stream(
+        self, last_event_id: str | None = Header(None), user: AccountSnapshot = Depends(get_streaming_user)
+    ) -> StreamingResponse:
+        """Server-sent events with the changes of the user's incoming transfers; `Last-Event-ID` replays the missed
+        ones first. An open stream waits on the worker's broker and holds no database connection."""
+
+        after = None if last_event_id is None else sql.decode_cursor(last_event_id, self.changes_sort_keys)[0]
+        return StreamingResponse(
+            self.iterate_events(user.id, after),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    async def iterate_events(self, destination: int, after: int | None) -> AsyncIterator[bytes]:
+        queue = notify.broker.subscribe(destination)
+        try:
+            # a comment goes out at once, so a client resuming without a backlog is not left waiting for the first ping
+            yield b": connected\n\n"
+            if after is None:
+                # an id without data only moves the client's position, for a stream that ends before any event
+                last_seq = await run_in_threadpool(self.read_last_seq, destination)
+                yield b"id: %s\n\n" % self.get_token(last_seq).encode()
+
+            # subscribed before reading, so changes committed meanwhile wait in the queue
+            while after is not None and (changes := await run_in_threadpool(self.read_backlog, destination, after)):
+                for change in changes:
+                    yield self.format_event(change)
+
+                after = changes[-1]["seq"]
+
+            # streams end after a while and resume from the last id, so that they are spread over the workers again
+            # and do not hold up a graceful shutdown
+            closes_at = monotonic() + env.STREAM_MAX_AGE
+            while (timeout := closes_at - monotonic()) > 0:
+                try:
+                    change = await asyncio.wait_for(queue.get(), min(timeout, env.STREAM_PING_INTERVAL))
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+
+                if change is None:
+                    return
+
+                if after is None or change["seq"] > after:
+                    yield self.format_event(change)
+        finally:
+            notify.broker.unsubscribe(destination, queue)
+
+    def read_backlog(self, destination: int, after: int) -> list[notify.Change]:
+        with SessionFactory(info={"read_only": True, "primary": True}) as session:
+            return [self.get_change(transfer) for transfer in self.read_changes(session, destination, after, 1000)]
+
+    def read_last_seq(self, destination: int) -> int:
+        stmt = select(func.coalesce(func.max(self.model.change_seq), 0)).where(self.model.destination == destination)
+        with SessionFactory(info={"read_only": True, "primary": True}) as session:
+            return session.scalar(stmt)
+
+    def format_event(self, change: notify.Change) -> bytes:
+        token = self.get_token(change["seq"])
+        return b"id: %s\nevent: transfer\ndata: %s\n\n" % (token.encode(), orjson.dumps(change["item"]))
+
+    def get_token(self, change_seq: int) -> str:
+        return sql.encode_cursor(self.changes_sort_keys, [change_seq])
+
+    def get_change(self, transfer: Transfer) -> notify.Change:
+        item = TransferChangeScheme.from_orm(transfer).dict()
+        return {"destination": transfer.destination, "seq": transfer.change_seq, "item": item}
+
+    def publish_changes(self, session: Session, transfers: Sequence[Transfer]) -> None:
+        """Send the transfers, as this transaction leaves them, to the streams of their recipients."""
+
+        session.flush()
+        # change_seq is assigned by the database, so the rows are read back
+        stmt = select(self.model).where(self.model.id.in_([transfer.id for transfer in transfers]))
+        changes = session.scalars(stmt.execution_options(populate_existing=True))
+        notify.publish(session, [self.get_change(transfer) for transfer in changes])
+
+    def lock_transfers(
+        self, session: Session, ids: Sequence[int], user: AccountSnapshot
+    ) -> tuple[dict[int, Transfer], dict[int, dict[str, Any]]]:
+        """Pending transfers of the user that could be locked, and error results for the other ids."""
+
+        transfers, locked_ids = sql.lock_instances(session, self.model, ids, self.get_filtration(user))
+        results = {
+            obj_id: {"error": (LockedError if obj_id in locked_ids else UndefinedError).__name__}
+            for obj_id in ids
+            if obj_id not in transfers
+        }
+        return transfers, results
+
+    def close_batch(self, session: Session, transfers: Sequence[Transfer], status: StatusTransfer) -> None:
+        if session.get_bind().dialect.name == "postgresql":
+            # the trigger locks the recipients in the order the update visits the rows; taking the locks up front in
+            # ascending order keeps two batches over the same recipients from deadlocking
+            session.execute(
+                text(f"SELECT {transfer_destination_lock.format(':destination')}"),
+                [{"destination": destination} for destination in sorted({t.destination for t in transfers})],
+            )
+
+        stmt = update(Transfer).where(Transfer.id.in_([transfer.id for transfer in transfers]))
+        session.execute(stmt.values(status=status, closed_at=datetime.now(timezone.utc)))
+        self.publish_changes(session, transfers)
+
+    def get_filtration(self, user: AccountSnapshot) -> sql.OneModelFiltration[sql.OneModelStatement[Transfer]] | None:
+        if user.is_admin:
+            return sql.OneModelFiltration(self.filter_initial)
+
+        return sql.OneModelFiltration(self.filter_by_destination, {"destination_id": user.id})
 
     def get_filtration_by_source(
         self, user: Account, money: Money
     ) -> sql.OneModelFiltration[sql.OneModelStatement[Transfer]] | None:
-        def accesse_filter(stmt: sql.OneModelStatement[Transfer]) -> sql.OneModelStatement[Transfer]:
-            return stmt.where(
-                self.model.source == user.id,
-                self.model.money == money.id,
-                self.model.status == StatusTransfer.initial,
-            )
+        return sql.OneModelFiltration(self.filter_by_source, {"source_id": user.id, "money_id": money.id})
+
+    def filter_initial(self, stmt: sql.OneModelStatement[Transfer]) -> sql.OneModelStatement[Transfer]:
+        # rendered inline so that generic plans of prepared statements can still use the partial indexes
+        return stmt.where(self.model.status == literal(StatusTransfer.initial, self.model.status.type, True))
 
-        return accesse_filter
+    def filter_by_destination(self, stmt: sql.OneModelStatement[Transfer]) -> sql.OneModelStatement[Transfer]:
+        return self.filter_initial(stmt).where(self.model.destination == bindparam("destination_id"))
+
+    def filter_by_source(self, stmt: sql.OneModelStatement[Transfer]) -> sql.OneModelStatement[Transfer]:
+        return self.filter_initial(stmt).where(
+            self.model.source == bindparam("source_id"), self.model.money == bindparam("money_id")
+        )
 
     def validate_transfer(self, scheme: CreateTransferScheme, session: Session) -> tuple[Account, Account, Money]:
         source = sql.get_instance_by_id(session, scheme.source, Account)
         destination = sql.get_instance_by_id(session, scheme.destination, Account)
-        money = sql.get_instance_by_id(session, scheme.money, Money, lambda stmt: stmt.with_for_update())
+        money = sql.get_instance_by_id(session, scheme.money, Money, sql.FOR_UPDATE)
 
         if source is None or destination is None or money is None:
             raise MissingObjectsError()
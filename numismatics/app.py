@@ -1,7 +1,8 @@
 from fastapi import FastAPI
 
+from . import compression, env, exports, notify, timing
 from .api import AccountResolver, CatalogResolver, MoneyResolver, TransferResolver
-from .db import engine
+from .db import ReadYourWritesMiddleware, async_engine, async_replica_engines, engine, replica_engines
 from .models import Currency, IssuingState, Mint, TypeMoney
 from .models_schemes import CatalogModelScheme
 from .schemes import CatalogScheme
@@ -16,7 +17,41 @@ MoneyResolver().connect_with_app("/money", app)
 AccountResolver().connect_with_app("/account", app)
 TransferResolver().connect_with_app("/transfer", app)
 
+if replica_engines or async_replica_engines:
+    app.add_middleware(ReadYourWritesMiddleware, window=env.REPLICA_STICKY_SECONDS)
+
+if env.COMPRESSION:
+    app.add_middleware(
+        compression.CompressionMiddleware,
+        minimum_size=env.COMPRESSION_MIN_SIZE,
+        gzip_level=env.GZIP_LEVEL,
+        zstd_level=env.ZSTD_LEVEL,
+    )
+
+if env.SERVER_TIMING:
+    for instrumented_engine in [
+        engine if async_engine is None else async_engine.sync_engine,
+        *replica_engines,
+        *[replica.sync_engine for replica in async_replica_engines],
+    ]:
+        timing.instrument_engine(instrumented_engine)
+
+    timing.instrument_sessions()
+    app.add_middleware(timing.ServerTimingMiddleware)
+
+
+@app.on_event("startup")
+def start_export_maintenance() -> None:
+    exports.maintenance.start()
+
 
 @app.on_event("shutdown")
-def shutdown_db() -> None:
-    return engine.dispose()
+async def shutdown_db() -> None:
+    notify.broker.reset()
+    exports.maintenance.stop()
+    for sync_engine in [engine, *replica_engines]:
+        sync_engine.dispose()
+
+    for an_async_engine in [async_engine, *async_replica_engines]:
+        if an_async_engine is not None:
+            await an_async_engine.dispose()
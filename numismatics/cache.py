@@ -0,0 +1,143 @@
+from bisect import bisect_right
+from collections import OrderedDict
+from collections.abc import Callable
+from datetime import datetime
+from threading import Lock
+from time import monotonic
+from typing import Any, NamedTuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from . import env, sql
+from .models import Account, BaseModel
+
+
+class CatalogEntry(NamedTuple):
+    version: int
+    loaded_at: float
+    ids: tuple[int, ...]
+    id_set: frozenset[int]
+
+
+class AccountSnapshot(NamedTuple):
+    id: int
+    name: str
+    is_admin: bool
+    deleted_at: datetime | None
+
+
+class CatalogCache:
+    """Live ids of the catalog tables; reloaded after local invalidation or once the TTL expires. An unknown id
+    reloads the table at most once per `reload_interval` seconds."""
+
+    def __init__(self, ttl: float, reload_interval: float) -> None:
+        self.ttl = ttl
+        self.reload_interval = reload_interval
+        self.versions: dict[type[BaseModel], int] = {}
+        self.entries: dict[type[BaseModel], CatalogEntry] = {}
+
+    def get_ids(self, session: Session, model: type[BaseModel]) -> tuple[int, ...]:
+        return self.get_entry(session, model).ids
+
+    def get_page_ids(self, session: Session, model: type[BaseModel], after: int | None, limit: int) -> tuple[int, ...]:
+        ids = self.get_ids(session, model)
+        start = 0 if after is None else bisect_right(ids, after)
+        return ids[start : start + limit]
+
+    def contains(self, session: Session, model: type[BaseModel], obj_id: int) -> bool:
+        return not self.get_missing(session, model, {obj_id})
+
+    def get_missing(self, session: Session, model: type[BaseModel], ids: set[int]) -> set[int]:
+        entry = self.get_entry(session, model)
+        if (missing := ids - entry.id_set) and monotonic() - entry.loaded_at >= self.reload_interval:
+            missing -= self.load(session, model).id_set
+
+        return missing
+
+    def get_entry(self, session: Session, model: type[BaseModel]) -> CatalogEntry:
+        entry = self.entries.get(model)
+        if entry is None or entry.version != self.versions.get(model, 0) or monotonic() - entry.loaded_at > self.ttl:
+            entry = self.load(session, model)
+
+        return entry
+
+    def load(self, session: Session, model: type[BaseModel]) -> CatalogEntry:
+        version = self.versions.get(model, 0)
+        stmt = select(model.id).where(sql.get_filter_by_existing(model)).order_by(model.id)
+        ids = tuple(session.scalars(stmt, bind_arguments={"primary": True}))
+        entry = self.entries[model] = CatalogEntry(version, monotonic(), ids, frozenset(ids))
+        return entry
+
+    def invalidate(self, model: type[BaseModel]) -> None:
+        self.versions[model] = self.versions.get(model, 0) + 1
+
+    def invalidate_on_commit(self, session: Session, model: type[BaseModel]) -> None:
+        on_commit(session, lambda: self.invalidate(model))
+
+
+class PrincipalCache:
+    """Bounded LRU of authenticated accounts by name; entries live for `ttl` seconds."""
+
+    def __init__(self, size: int, ttl: float) -> None:
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self.entries: OrderedDict[str, tuple[AccountSnapshot, float]] = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, session: Session, name: str) -> AccountSnapshot | None:
+        with self.lock:
+            if (entry := self.entries.get(name)) is not None and entry[1] > monotonic():
+                self.entries.move_to_end(name)
+                self.hits += 1
+                return entry[0]
+
+            self.misses += 1
+            generation = self.generation
+
+        stmt = select(Account.id, Account.name, Account.is_admin, Account.deleted_at).where(Account.name == name)
+        if (row := session.execute(stmt, bind_arguments={"primary": True}).first()) is None:
+            return None
+
+        snapshot = AccountSnapshot(*row)
+        with self.lock:
+            if generation == self.generation:
+                self.entries[name] = (snapshot, monotonic() + self.ttl)
+                self.entries.move_to_end(name)
+                while len(self.entries) > self.size:
+                    self.entries.popitem(last=False)
+
+        return snapshot
+
+    def invalidate(self, account_id: int) -> None:
+        with self.lock:
+            self.generation += 1
+            for name in [name for name, (snapshot, _) in self.entries.items() if snapshot.id == account_id]:
+                del self.entries[name]
+
+    def invalidate_on_commit(self, session: Session, account_id: int) -> None:
+        self.invalidate(account_id)
+        on_commit(session, lambda: self.invalidate(account_id))
+
+
+catalog_cache = CatalogCache(env.CATALOG_CACHE_TTL, env.CATALOG_RELOAD_INTERVAL)
+
+principal_cache = PrincipalCache(env.PRINCIPAL_CACHE_SIZE, env.PRINCIPAL_CACHE_TTL)
+
+
+def on_commit(session: Session, callback: Callable[[], None]) -> None:
+    session.info.setdefault("on_commit", []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def run_commit_callbacks(session: Session) -> None:
+    for callback in session.info.pop("on_commit", ()):
+        callback()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def forget_commit_callbacks(session: Session, previous_transaction: Any) -> None:
+    session.info.pop("on_commit", None)
@@ -0,0 +1,156 @@
+import zlib
+from typing import Protocol
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import zstandard
+except ImportError:  # optional, only gzip is offered without it
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson")
+# event streams go out as they are and without delay: their headers must not wait for the first event
+STREAMED_TYPES = ("text/event-stream",)
+UNCOMPRESSED_STATUSES = (204, 206, 304)
+
+
+class Encoder(Protocol):
+    def compress(self, data: bytes) -> bytes:
+        ...
+
+    def finish(self) -> bytes:
+        ...
+
+
+class GzipEncoder:
+    def __init__(self, level: int) -> None:
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        # flushed per chunk, so a client can decode a streamed export as it arrives
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self.compressor.flush()
+
+
+class ZstdEncoder:
+    def __init__(self, level: int) -> None:
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.compress(data) + self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self.compressor.flush()
+
+
+def get_encodings() -> list[str]:
+    """Supported encodings, most preferred first."""
+
+    return ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+
+
+def choose_encoding(accept_encoding: str, encodings: list[str]) -> str | None:
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        weight = 1.0
+        if (param := params.strip()).startswith("q="):
+            try:
+                weight = float(param[2:])
+            except ValueError:
+                weight = 0.0
+
+        weights[name.strip().lower()] = weight
+
+    accepted = [name for name in encodings if weights.get(name, weights.get("*", 0.0)) > 0]
+    return max(accepted, key=lambda name: weights.get(name, weights.get("*", 0.0)), default=None)
+
+
+class CompressionMiddleware:
+    """Compress response bodies chunk by chunk with the preferred encoding the client accepts.
+
+    Complete bodies below `minimum_size` are sent as they are; streamed bodies are compressed from the first chunk.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int, gzip_level: int, zstd_level: int) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": gzip_level, "zstd": zstd_level}
+        self.encodings = get_encodings()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start: Message | None = None
+        encoder: Encoder | None = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, encoder
+            if message["type"] == "http.response.start":
+                if Headers(raw=message["headers"]).get("content-type", "").startswith(STREAMED_TYPES):
+                    return await send(message)
+
+                # held back until the first body chunk shows whether the response is worth compressing
+                start = message
+                return
+
+            if start is not None:
+                if self.should_compress(start, message):
+                    encoder = self.get_encoder(encoding)
+                    self.set_headers(MutableHeaders(scope=start), encoding)
+
+                await send(start)
+                start = None
+
+            if encoder is None or message["type"] != "http.response.body":
+                return await send(message)
+
+            more_body = message.get("more_body", False)
+            body = encoder.compress(message.get("body", b""))
+            if not more_body:
+                body += encoder.finish()
+
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def should_compress(self, start: Message, message: Message) -> bool:
+        headers = Headers(raw=start["headers"])
+        if start["status"] in UNCOMPRESSED_STATUSES or "content-encoding" in headers:
+            return False
+
+        # byte ranges address the identity bytes, so files served with ranges stay as they are
+        if "accept-ranges" in headers:
+            return False
+
+        if not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+            return False
+
+        if "content-length" in headers:
+            return int(headers["content-length"]) >= self.minimum_size
+
+        return message.get("more_body", False) or len(message.get("body", b"")) >= self.minimum_size
+
+    def set_headers(self, headers: MutableHeaders, encoding: str) -> None:
+        headers["Content-Encoding"] = encoding
+        headers.add_vary_header("Accept-Encoding")
+        if "content-length" in headers:
+            del headers["content-length"]
+
+        # the encoded bytes differ from the identity ones, which a strong tag would promise to match
+        if (etag := headers.get("etag")) is not None and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+
+    def get_encoder(self, encoding: str) -> Encoder:
+        if encoding == "zstd":
+            return ZstdEncoder(self.levels["zstd"])
+
+        return GzipEncoder(self.levels["gzip"])
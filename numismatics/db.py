@@ -1,8 +1,111 @@
-from sqlalchemy import Engine, create_engine
-from sqlalchemy.orm import sessionmaker
+import random
+from collections.abc import Mapping
+from math import ceil
+from time import time
+from typing import Any, ClassVar
+
+from sqlalchemy import Delete, Engine, Insert, Update, create_engine, event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from . import env
+from .settings import engine_settings
+
+engine: Engine = create_engine(env.FAST_DB, **engine_settings.get_engine_options(env.FAST_DB))
+engine_settings.configure_engine(engine)
+
+WRITTEN_AT_COOKIE = "fast_written_at"
+
+replica_engines: list[Engine] = [
+    create_engine(url, **engine_settings.get_engine_options(url)) for url in env.FAST_DB_REPLICAS
+]
+for replica_engine in replica_engines:
+    engine_settings.configure_engine(replica_engine)
+
+
+class RoutingSession(Session):
+    """Send reads of read-only sessions to a replica, the same one for the whole session so that its statements see
+    one state and share one connection; flushes, DML, other sessions and statements executed with
+    `bind_arguments={"primary": True}` (the shared caches) use the primary."""
+
+    replicas: ClassVar[list[Engine]] = replica_engines
+
+    def get_bind(self, mapper: Any = None, clause: Any = None, **kw: Any) -> Any:
+        if (
+            self.replicas
+            and self.info.get("read_only")
+            and not self.info.get("primary")
+            and not kw.get("primary")
+            and not self._flushing
+            and not isinstance(clause, Insert | Update | Delete)
+        ):
+            if (replica := self.info.get("replica")) is None:
+                replica = self.info["replica"] = random.choice(self.replicas)
+
+            return replica
+
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+class ReadYourWritesMiddleware:
+    """Give a client that committed a write a cookie with the commit time; its requests read from the primary for
+    `window` seconds afterwards, whichever worker or host serves them."""
+
+    def __init__(self, app: ASGIApp, window: float) -> None:
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start" and (written_at := scope.get("state", {}).get("written_at")):
+                cookie = f"{WRITTEN_AT_COOKIE}={written_at:.3f}; Max-Age={ceil(self.window)}; Path=/; HttpOnly"
+                MutableHeaders(scope=message).append("Set-Cookie", cookie)
+
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+def wrote_recently(cookies: Mapping[str, str]) -> bool:
+    try:
+        written_at = float(cookies.get(WRITTEN_AT_COOKIE, ""))
+    except ValueError:
+        return False
+
+    return time() - written_at < env.REPLICA_STICKY_SECONDS
+
+
+SessionFactory = sessionmaker(engine, class_=RoutingSession, expire_on_commit=False)
+
+async_engine: AsyncEngine | None = None
+
+async_replica_engines: list[AsyncEngine] = [
+    create_async_engine(url, **engine_settings.get_engine_options(url)) for url in env.FAST_DB_ASYNC_REPLICAS
+]
+for async_replica_engine in async_replica_engines:
+    engine_settings.configure_engine(async_replica_engine.sync_engine)
+
+
+class AsyncRoutingSession(RoutingSession):
+    replicas = [replica.sync_engine for replica in async_replica_engines]
+
+
+AsyncSessionFactory: async_sessionmaker[AsyncSession] | None = None
+
+if env.FAST_DB_ASYNC:
+    async_engine = create_async_engine(env.FAST_DB_ASYNC, **engine_settings.get_engine_options(env.FAST_DB_ASYNC))
+    engine_settings.configure_engine(async_engine.sync_engine)
+    AsyncSessionFactory = async_sessionmaker(
+        async_engine, sync_session_class=AsyncRoutingSession, expire_on_commit=False
+    )
 
-engine: Engine = create_engine(env.FAST_DB, echo=True)
 
-SessionFactory = sessionmaker(engine, expire_on_commit=False)
+@event.listens_for(RoutingSession, "after_commit")
+def mark_written(session: Session) -> None:
+    if not session.info.get("read_only") and (state := session.info.get("request_state")) is not None:
+        state.written_at = time()
@@ -1,5 +1,11 @@
-from .db import engine
-from .models import BaseModel
+from sqlalchemy import Column, Connection, DateTime, Table, inspect, text
+
+from . import exports, stats
+from .db import SessionFactory, engine
+from .models import BaseModel, Money, create_trigram_extension, money_search_ddl, transfer_change_seq_ddl
+
+# values for the rows already there when a column is added to an existing table
+backfills = {("transfer", "change_seq"): "id", ("export_job", "heartbeat_at"): "created_at"}
 
 
 def create_all() -> None:
@@ -8,3 +14,101 @@ def create_all() -> None:
 
 def drop_all() -> None:
     BaseModel.metadata.drop_all(engine)
+
+
+def recreate_indexes() -> None:
+    """Drop and create every declared index, so existing databases pick up changed definitions."""
+
+    with engine.begin() as connection:
+        for table in BaseModel.metadata.sorted_tables:
+            for index in table.indexes:
+                index.drop(connection, checkfirst=True)
+                index.create(connection)
+
+
+def rebuild_stats() -> None:
+    with SessionFactory() as session, session.begin():
+        stats.rebuild(session)
+
+
+def purge_exports() -> None:
+    with SessionFactory() as session, session.begin():
+        exports.maintain(session)
+
+
+def migrate() -> None:
+    """Bring a database created by an earlier version up to the models: create the missing tables, sequences and
+    indexes, add the missing columns together with their backfill and triggers, and store timestamps with the time
+    zone on PostgreSQL."""
+
+    with engine.begin() as connection:
+        existing_tables = set(inspect(connection).get_table_names())
+        BaseModel.metadata.create_all(connection)
+        create_trigram_extension(Money.__table__, connection)
+        for table in BaseModel.metadata.sorted_tables:
+            if table.name in existing_tables:
+                migrate_columns(connection, table)
+
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+        if "money_search" not in existing_tables and "money" in existing_tables:
+            for ddl in money_search_ddl.get(connection.dialect.name, []):
+                connection.execute(ddl)
+
+            if connection.dialect.name == "sqlite":
+                connection.execute(text("INSERT INTO money_search(money_search) VALUES ('rebuild')"))
+
+    if "money_stats" not in existing_tables:
+        rebuild_stats()
+
+
+def migrate_columns(connection: Connection, table: Table) -> None:
+    columns = {column["name"]: column for column in inspect(connection).get_columns(table.name)}
+    # types are changed before the columns are added: PostgreSQL does not alter a column used by a trigger
+    if connection.dialect.name == "postgresql":
+        for column in table.columns:
+            if (
+                column.name in columns
+                and isinstance(column.type, DateTime)
+                and column.type.timezone
+                and not columns[column.name]["type"].timezone
+            ):
+                connection.execute(
+                    text(
+                        f"ALTER TABLE {table.name} ALTER COLUMN {column.name} TYPE timestamptz "
+                        f"USING {column.name} AT TIME ZONE 'UTC'"
+                    )
+                )
+
+    for column in table.columns:
+        if column.name not in columns:
+            add_column(connection, table, column)
+
+
+def add_column(connection: Connection, table: Table, column: Column) -> None:
+    dialect = connection.dialect
+    column_type = column.type.compile(dialect=dialect)
+    if column.server_default is not None:
+        default = dialect.ddl_compiler(dialect, None).get_column_default_string(column)
+        connection.execute(
+            text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type} DEFAULT {default} NOT NULL")
+        )
+    else:
+        # SQLite cannot add the constraint afterwards, there the column stays nullable
+        connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+    if (backfill := backfills.get((table.name, column.name))) is not None:
+        connection.execute(text(f"UPDATE {table.name} SET {column.name} = {backfill}"))
+
+    if column.server_default is None and not column.nullable and dialect.name == "postgresql":
+        connection.execute(text(f"ALTER TABLE {table.name} ALTER COLUMN {column.name} SET NOT NULL"))
+
+    if (table.name, column.name) == ("transfer", "change_seq"):
+        if dialect.name == "postgresql":
+            connection.execute(
+                text("SELECT setval('transfer_change_seq', (SELECT coalesce(max(id), 0) + 1 FROM transfer), false)")
+            )
+
+        for ddl in transfer_change_seq_ddl.get(dialect.name, []):
+            connection.execute(ddl)
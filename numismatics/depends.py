@@ -1,37 +1,127 @@
-from typing import Any, Callable, TypeVar
+from collections.abc import AsyncIterator, Iterator
+from functools import wraps
+from typing import Any, Callable, TypeVar, cast
 
 from fastapi import Depends, Request
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from sqlalchemy.util import greenlet_spawn
 
+from . import env
+from .cache import AccountSnapshot, principal_cache
+from .db import AsyncSessionFactory, SessionFactory, wrote_recently
 from .errors import UnauthorizedError
-from .models import Account
 from .schemes import BaseScheme, OrderingScheme
+from .timing import mark_handler_finished
 
 SchemeT = TypeVar("SchemeT", bound=BaseScheme)
+HandlerT = TypeVar("HandlerT", bound=Callable[..., Any])
+ChunkT = TypeVar("ChunkT")
 
 security = HTTPBasic()
 
+READ_ONLY_METHODS = ("GET", "HEAD")
 
-def get_session(request: Request) -> Session:
-    session = getattr(request.state, "session", None)
-    assert session is not None
-    return session
 
+def get_session_info(request: Request) -> dict[str, Any]:
+    return {
+        "read_only": request.method in READ_ONLY_METHODS,
+        "primary": wrote_recently(request.cookies),
+        "request_state": request.state,
+    }
 
-def get_current_user(
-    session: Session = Depends(get_session), credentials: HTTPBasicCredentials = Depends(security)
-) -> Account:
-    current_username = credentials.username
-    query = select(Account).where(Account.name == current_username)
-    if (obj := session.scalar(query)) is None:
+
+def get_sync_session(request: Request) -> Iterator[Session]:
+    with SessionFactory(info=get_session_info(request)) as session:
+        yield session
+
+
+async def get_async_session(request: Request) -> AsyncIterator[AsyncSession]:
+    assert AsyncSessionFactory is not None
+    async with AsyncSessionFactory(info=get_session_info(request)) as session:
+        yield session
+
+
+get_session: Callable[[Request], Iterator[Session]] | Callable[[Request], AsyncIterator[AsyncSession]] = (
+    get_async_session if env.FAST_DB_ASYNC else get_sync_session
+)
+
+
+def with_session(handler: HandlerT) -> HandlerT:
+    """In async mode run a sync handler with the `session` argument inside `AsyncSession.run_sync`."""
+
+    if not env.FAST_DB_ASYNC:
+        return handler
+
+    @wraps(handler)
+    async def run_sync(session: AsyncSession, **kwargs: Any) -> Any:
+        return await session.run_sync(lambda sync_session: handler(session=sync_session, **kwargs))
+
+    return cast(HandlerT, run_sync)
+
+
+def transactional(handler: HandlerT) -> HandlerT:
+    """Commit the request session after the handler returns and before the response is sent."""
+
+    if env.FAST_DB_ASYNC:
+
+        @wraps(handler)
+        async def run_async(session: AsyncSession, **kwargs: Any) -> Any:
+            result = await session.run_sync(lambda sync_session: handler(session=sync_session, **kwargs))
+            await session.commit()
+            mark_handler_finished()
+            return result
+
+        return cast(HandlerT, run_async)
+
+    @wraps(handler)
+    def run(session: Session, **kwargs: Any) -> Any:
+        result = handler(session=session, **kwargs)
+        session.commit()
+        mark_handler_finished()
+        return result
+
+    return cast(HandlerT, run)
+
+
+def iterate_in_session(iterator: Iterator[ChunkT]) -> Iterator[ChunkT] | AsyncIterator[ChunkT]:
+    """Iterate a generator that reads from the request session; in async mode each step runs in a greenlet."""
+
+    if not env.FAST_DB_ASYNC:
+        return iterator
+
+    async def iterate_in_greenlet() -> AsyncIterator[ChunkT]:
+        sentinel = object()
+        while (chunk := await greenlet_spawn(next, iterator, sentinel)) is not sentinel:
+            yield chunk
+
+    return iterate_in_greenlet()
+
+
+def authenticate(session: Session, credentials: HTTPBasicCredentials) -> AccountSnapshot:
+    if (user := principal_cache.get(session, credentials.username)) is None:
         raise UnauthorizedError("undefined user")
 
-    return obj
+    return user
+
+
+@with_session
+def get_current_user(
+    credentials: HTTPBasicCredentials = Depends(security), session: Session = Depends(get_session)
+) -> AccountSnapshot:
+    return authenticate(session, credentials)
+
+
+def get_streaming_user(credentials: HTTPBasicCredentials = Depends(security)) -> AccountSnapshot:
+    """`get_current_user` for long-lived responses: its session is closed before the response starts, so an open
+    stream holds no database connection."""
+
+    with SessionFactory(info={"read_only": True}) as session:
+        return authenticate(session, credentials)
 
 
-def get_super_user(user: Account = Depends(get_current_user)) -> Account:
+def get_super_user(user: AccountSnapshot = Depends(get_current_user)) -> AccountSnapshot:
     if user.is_admin:
         return user
 
@@ -54,4 +144,5 @@ def get_ordering(order_by: str | None = None) -> dict[str, Any]:
         for part in order_by.strip().split(",")
         if part
     }
-    return OrderingScheme.parse_obj(fields).dict(exclude_none=True)
+    ordering = OrderingScheme.parse_obj(fields).dict(exclude_none=True)
+    return {field: ordering[field] for field in fields if field in ordering}
@@ -1,3 +1,26 @@
 import os
+import tempfile
 
 FAST_DB: str = os.environ["FAST_DB"]
+FAST_DB_ASYNC: str | None = os.environ.get("FAST_DB_ASYNC") or None
+CATALOG_CACHE_TTL: float = float(os.environ.get("FAST_CATALOG_CACHE_TTL", 60))
+CATALOG_RELOAD_INTERVAL: float = float(os.environ.get("FAST_CATALOG_RELOAD_INTERVAL", 1))
+PRINCIPAL_CACHE_SIZE: int = int(os.environ.get("FAST_PRINCIPAL_CACHE_SIZE", 1024))
+PRINCIPAL_CACHE_TTL: float = float(os.environ.get("FAST_PRINCIPAL_CACHE_TTL", 30))
+RAW_JSON: bool = os.environ.get("FAST_RAW_JSON", "0") == "1"
+SERVER_TIMING: bool = os.environ.get("FAST_SERVER_TIMING", "0") == "1"
+FAST_DB_REPLICAS: list[str] = [url for url in os.environ.get("FAST_DB_REPLICAS", "").split(",") if url]
+FAST_DB_ASYNC_REPLICAS: list[str] = [url for url in os.environ.get("FAST_DB_ASYNC_REPLICAS", "").split(",") if url]
+REPLICA_STICKY_SECONDS: float = float(os.environ.get("FAST_DB_REPLICA_STICKY", 5))
+COMPRESSION: bool = os.environ.get("FAST_COMPRESSION", "1") == "1"
+COMPRESSION_MIN_SIZE: int = int(os.environ.get("FAST_COMPRESSION_MIN_SIZE", 1024))
+GZIP_LEVEL: int = int(os.environ.get("FAST_GZIP_LEVEL", 6))
+ZSTD_LEVEL: int = int(os.environ.get("FAST_ZSTD_LEVEL", 3))
+EXPORT_DIR: str = os.environ.get("FAST_EXPORT_DIR", os.path.join(tempfile.gettempdir(), "numismatics-exports"))
+EXPORT_WORKERS: int = int(os.environ.get("FAST_EXPORT_WORKERS", 2))
+EXPORT_RETENTION: float = float(os.environ.get("FAST_EXPORT_RETENTION", 24 * 60 * 60))
+EXPORT_LEASE: float = float(os.environ.get("FAST_EXPORT_LEASE", 5 * 60))
+EXPORT_MAINTENANCE_INTERVAL: float = float(os.environ.get("FAST_EXPORT_MAINTENANCE_INTERVAL", 60))
+STREAM_QUEUE_SIZE: int = int(os.environ.get("FAST_STREAM_QUEUE_SIZE", 1000))
+STREAM_PING_INTERVAL: float = float(os.environ.get("FAST_STREAM_PING_INTERVAL", 15))
+STREAM_MAX_AGE: float = float(os.environ.get("FAST_STREAM_MAX_AGE", 5 * 60))
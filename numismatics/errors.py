@@ -24,3 +24,23 @@ class UniqueError(BaseError):
 
 class SelfTransferError(BaseError):
     pass
+
+
+class InvalidCursorError(BaseError):
+    pass
+
+
+class UnsupportedFormatError(BaseError):
+    pass
+
+
+class ExportNotReadyError(BaseError):
+    pass
+
+
+class LockedError(BaseError):
+    pass
+
+
+class InvalidEncodingError(BaseError):
+    pass
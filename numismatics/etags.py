@@ -0,0 +1,36 @@
+from hashlib import blake2b
+from typing import Any
+
+from fastapi import Response
+
+from . import sql
+
+VERSION_COLUMNS = ("id", "version")
+
+
+def make_etag(*parts: Any, weak: bool = False) -> str:
+    digest = blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+
+def get_page_etag(page: sql.Page[Any]) -> str:
+    """Weak tag of a page: the ids and row versions of its items plus the cursor to the next one."""
+
+    return make_etag([(item.id, item.version) for item in page.items], page.next_cursor, weak=True)
+
+
+def matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison, the one `If-None-Match` is defined with."""
+
+    if if_none_match is None:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    opaque_tag = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque_tag for tag in if_none_match.split(","))
+
+
+def not_modified(etag: str, response: Response) -> Response:
+    return Response(status_code=304, headers={**response.headers, "ETag": etag})
@@ -0,0 +1,294 @@
+import logging
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Any
+
+from fastapi import Response
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import Session
+
+from . import env, etags, sql
+from .db import SessionFactory
+from .models import ExportJob, Money
+from .schemes import PaginationScheme
+from .types import StatusExport
+
+logger = logging.getLogger(__name__)
+
+Dumper = Callable[[Iterable[Sequence[Any]], Sequence[str]], Iterator[str | bytes]]
+
+executor = ThreadPoolExecutor(env.EXPORT_WORKERS, thread_name_prefix="export")
+read_size = 64 * 1024
+
+# jobs submitted to this process, their leases are renewed until they finish
+active_jobs: set[int] = set()
+active_jobs_lock = Lock()
+
+
+def filter_by_user(stmt: sql.OneModelStatement[ExportJob]) -> sql.OneModelStatement[ExportJob]:
+    return stmt.where(ExportJob.user == bindparam("user_id"))
+
+
+def filter_snapshot(stmt: sql.OneModelStatement[Money]) -> sql.OneModelStatement[Money]:
+    return stmt.where(Money.user == bindparam("user_id"), Money.id <= bindparam("max_money_id"))
+
+
+def get_path(job: ExportJob) -> Path:
+    return Path(env.EXPORT_DIR) / f"money-{job.id}.{job.format}"
+
+
+def get_part_path(job: ExportJob) -> Path:
+    path = get_path(job)
+    return path.with_name(f"{path.name}.part")
+
+
+def create_job(
+    session: Session, user_id: int, export_format: str, filters: dict[str, Any], order_by: dict[str, str]
+) -> ExportJob:
+    now = datetime.now(timezone.utc)
+    job = ExportJob(
+        user=user_id,
+        status=StatusExport.pending,
+        format=export_format,
+        filters=filters,
+        order_by=order_by,
+        max_money_id=session.scalar(select(func.coalesce(func.max(Money.id), 0))),
+        total=0,
+        created_at=now,
+        expires_at=now + timedelta(seconds=env.EXPORT_RETENTION),
+        heartbeat_at=now,
+    )
+    filtration = get_snapshot_filtration(job)
+    stmt = get_snapshot_statement(job, filtration).with_only_columns(func.count(), maintain_column_froms=True)
+    job.total = session.scalar(stmt, sql.get_params(filtration))
+    session.add(job)
+    session.flush()
+    return job
+
+
+def submit(job_id: int, dump: Dumper, headers: Sequence[str], chunk_size: int) -> None:
+    with active_jobs_lock:
+        active_jobs.add(job_id)
+
+    executor.submit(run, job_id, dump, headers, chunk_size)
+
+
+def run(job_id: int, dump: Dumper, headers: Sequence[str], chunk_size: int) -> None:
+    """Write the export file on an export worker; every chunk is read in its own short transaction."""
+
+    try:
+        with SessionFactory() as session, session.begin():
+            # a job that waited in the queue past its lease may already have been failed by another process
+            if (job := session.get(ExportJob, job_id)) is None or job.status != StatusExport.pending:
+                return
+
+            job.status = StatusExport.running
+
+        write(job, dump, headers, chunk_size)
+    finally:
+        with active_jobs_lock:
+            active_jobs.discard(job_id)
+
+
+def write(job: ExportJob, dump: Dumper, headers: Sequence[str], chunk_size: int) -> None:
+    path, part_path = get_path(job), get_part_path(job)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with part_path.open("wb") as file:
+            for chunk in dump(read_partitions(job, headers, chunk_size), headers):
+                file.write(chunk.encode() if isinstance(chunk, str) else chunk)
+
+        part_path.replace(path)
+    except Exception:
+        logger.exception("export job %s failed", job.id)
+        part_path.unlink(missing_ok=True)
+        finish(job.id, StatusExport.failed)
+    else:
+        finish(job.id, StatusExport.done)
+
+
+def read_partitions(job: ExportJob, headers: Sequence[str], chunk_size: int) -> Iterator[Sequence[Any]]:
+    """Keyset pages over the coins that existed when the job was created, in the requested order."""
+
+    sort_keys = sql.get_sort_keys(Money, job.order_by)
+    filtration = get_snapshot_filtration(job)
+    stmt = get_snapshot_statement(job, filtration).with_only_columns(*[getattr(Money, field) for field in headers])
+    cursor, rows = None, 0
+    while True:
+        pagination = PaginationScheme(limit=chunk_size, cursor=cursor)
+        with SessionFactory(info={"read_only": True}) as session:
+            page_stmt = sql.get_page_statement(stmt, sort_keys, pagination)
+            page = sql.make_page(session.execute(page_stmt, sql.get_params(filtration)).all(), sort_keys, pagination)
+
+        if page.items:
+            yield page.items
+
+        rows += len(page.items)
+        with SessionFactory() as session, session.begin():
+            session.execute(update(ExportJob).where(ExportJob.id == job.id).values(rows=rows))
+
+        if (cursor := page.next_cursor) is None:
+            return
+
+
+def get_snapshot_filtration(job: ExportJob) -> sql.OneModelFiltration[sql.OneModelStatement[Money]]:
+    return sql.OneModelFiltration(filter_snapshot, {"user_id": job.user, "max_money_id": job.max_money_id})
+
+
+def get_snapshot_statement(
+    job: ExportJob, filtration: sql.OneModelFiltration[sql.OneModelStatement[Money]]
+) -> sql.OneModelStatement[Money]:
+    return sql.select_and_filter(Money, filtration).filter_by(**job.filters)
+
+
+def finish(job_id: int, status: StatusExport) -> None:
+    now = datetime.now(timezone.utc)
+    with SessionFactory() as session, session.begin():
+        session.execute(
+            update(ExportJob)
+            .where(ExportJob.id == job_id)
+            .values(status=status, finished_at=now, expires_at=now + timedelta(seconds=env.EXPORT_RETENTION))
+        )
+
+
+def maintain(session: Session) -> None:
+    renew_leases(session)
+    fail_abandoned(session)
+    purge_expired(session)
+
+
+def renew_leases(session: Session) -> None:
+    with active_jobs_lock:
+        job_ids = list(active_jobs)
+
+    if job_ids:
+        stmt = update(ExportJob).where(ExportJob.id.in_(job_ids))
+        session.execute(stmt.values(heartbeat_at=datetime.now(timezone.utc)))
+
+
+def fail_abandoned(session: Session) -> None:
+    """Fail the pending and running jobs whose process stopped renewing their lease, e.g. after a crash or restart."""
+
+    now = datetime.now(timezone.utc)
+    stmt = select(ExportJob).where(
+        ExportJob.status.in_([StatusExport.pending, StatusExport.running]),
+        ExportJob.heartbeat_at < now - timedelta(seconds=env.EXPORT_LEASE),
+        sql.get_filter_by_existing(ExportJob),
+    )
+    for job in session.scalars(stmt.with_for_update(skip_locked=True)):
+        logger.warning("export job %s was abandoned", job.id)
+        get_part_path(job).unlink(missing_ok=True)
+        job.status = StatusExport.failed
+        job.finished_at = now
+        job.expires_at = now + timedelta(seconds=env.EXPORT_RETENTION)
+
+
+def purge_expired(session: Session) -> None:
+    """Delete the files of jobs past their retention and soft delete the jobs."""
+
+    now = datetime.now(timezone.utc)
+    stmt = select(ExportJob).where(
+        ExportJob.expires_at < now, ExportJob.status != StatusExport.running, sql.get_filter_by_existing(ExportJob)
+    )
+    for job in session.scalars(stmt):
+        get_path(job).unlink(missing_ok=True)
+        get_part_path(job).unlink(missing_ok=True)
+        job.deleted_at = now
+
+
+class Maintenance:
+    """Renews the leases of this process's jobs, fails abandoned jobs and purges expired files every `interval`
+    seconds, starting right away."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.stopped = Event()
+        self.thread: Thread | None = None
+
+    def start(self) -> None:
+        self.stopped.clear()
+        self.thread = Thread(target=self.run, name="export-maintenance", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self) -> None:
+        while True:
+            try:
+                with SessionFactory() as session, session.begin():
+                    maintain(session)
+            except Exception:
+                logger.exception("export maintenance failed")
+
+            if self.stopped.wait(self.interval):
+                return
+
+
+maintenance = Maintenance(env.EXPORT_MAINTENANCE_INTERVAL)
+
+
+def get_file_response(path: Path, media_type: str, range_header: str | None, if_range: str | None) -> Response:
+    """The whole file, or a single byte range of it; `If-Range` only matches the current ETag."""
+
+    stat_result = path.stat()
+    size = stat_result.st_size
+    etag = etags.make_etag(path.name, size, stat_result.st_mtime_ns)
+    headers = {"Accept-Ranges": "bytes", "ETag": etag}
+    byte_range = None
+    if range_header is not None and if_range in (None, etag):
+        byte_range = parse_range(range_header, size)
+
+    if byte_range is None:
+        return FileResponse(path, headers=headers, media_type=media_type, filename=path.name, stat_result=stat_result)
+
+    start, end = byte_range
+    if start >= size:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    headers.update(
+        {
+            "Content-Range": f"bytes {start}-{end}/{size}",
+            "Content-Length": str(end - start + 1),
+            "Content-Disposition": f'attachment; filename="{path.name}"',
+        }
+    )
+    return StreamingResponse(read_range(path, start, end), status_code=206, media_type=media_type, headers=headers)
+
+
+def parse_range(range_header: str, size: int) -> tuple[int, int] | None:
+    """`(first, last)` byte of a single `bytes=` range; multiple or malformed ranges get the whole file."""
+
+    unit, _, byte_range = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in byte_range:
+        return None
+
+    first, _, last = byte_range.strip().partition("-")
+    try:
+        if not first:
+            return max(size - int(last), 0), size - 1
+
+        start, end = int(first), int(last) if last else None
+    except ValueError:
+        return None
+
+    if end is not None and end < start:
+        return None
+
+    return start, size - 1 if end is None else min(end, size - 1)
+
+
+def read_range(path: Path, start: int, end: int) -> Iterator[bytes]:
+    with path.open("rb") as file:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0 and (chunk := file.read(min(read_size, remaining))):
+            remaining -= len(chunk)
+            yield chunk
@@ -0,0 +1,69 @@
+import re
+from collections.abc import Sequence
+from typing import Any
+
+from sqlalchemy import ColumnElement, Engine, Float, Row, cast, func, literal_column, or_, table
+from sqlalchemy.orm import Session
+
+from . import sql
+from .models import Money, description_vector, has_trigrams, search_config
+from .schemes import PaginationScheme
+
+fts_table = table("money_search")
+trigram_support: dict[Engine, bool] = {}
+
+
+def search_page(
+    session: Session,
+    query: str,
+    columns: Sequence[str],
+    pagination: PaginationScheme,
+    filtration: sql.OneModelFiltration[sql.OneModelStatement[Money]] | None = None,
+) -> sql.Page[Row[Any]]:
+    """Coins ranked by full-text match of the description and by match of the serial number, best first."""
+
+    stmt = sql.select_and_filter(Money, filtration)
+    bind = session.get_bind()
+    if bind.dialect.name == "sqlite":
+        if not (match := get_fts_match(query)):
+            return sql.Page([], None)
+
+        rank = -func.bm25(literal_column(fts_table.name))
+        stmt = stmt.join(fts_table, literal_column(f"{fts_table.name}.rowid") == Money.id)
+        stmt = stmt.where(literal_column(fts_table.name).op("MATCH")(match))
+    else:
+        text_query = func.websearch_to_tsquery(search_config, query)
+        serial_prefix = Money.serial_number.ilike(escape_like(query) + "%", escape="\\")
+        if use_trigrams(session, bind):
+            rank = func.greatest(
+                func.ts_rank(description_vector, text_query), func.similarity(Money.serial_number, query)
+            )
+            serial_match = or_(Money.serial_number.op("%")(query), serial_prefix)
+        else:
+            rank, serial_match = func.ts_rank(description_vector, text_query), serial_prefix
+
+        stmt = stmt.where(or_(description_vector.op("@@")(text_query), serial_match))
+
+    rank_column: ColumnElement[float] = cast(rank, Float).label("rank")
+    sort_keys: Any = [(rank_column, "-"), (Money.id, "-")]
+    stmt = sql.get_page_statement(stmt, sort_keys, pagination)
+    stmt = stmt.with_only_columns(*[getattr(Money, column) for column in columns], rank_column)
+    rows = session.execute(stmt, sql.get_params(filtration)).all()
+    return sql.make_page(rows, sort_keys, pagination)
+
+
+def get_fts_match(query: str) -> str:
+    """Every word of the query as an FTS5 prefix term, so the query syntax of FTS5 never reaches it."""
+
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", query))
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def use_trigrams(session: Session, bind: Engine) -> bool:
+    if (supported := trigram_support.get(bind)) is None:
+        supported = trigram_support[bind] = has_trigrams(session.connection())
+
+    return supported
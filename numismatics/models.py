@@ -1,22 +1,54 @@
 from __future__ import annotations
 
 from datetime import datetime
+from typing import Any
 
-from sqlalchemy import ForeignKey, Index, String, column
+from sqlalchemy import (
+    DDL,
+    JSON,
+    BigInteger,
+    Column,
+    Connection,
+    DateTime,
+    FetchedValue,
+    ForeignKey,
+    Index,
+    Integer,
+    Sequence,
+    String,
+    Table,
+    column,
+    event,
+    func,
+    literal_column,
+    text,
+)
 from sqlalchemy.orm import DeclarativeBase, Mapped, declared_attr, mapped_column
 
-from .types import StatusTransfer
+from .types import StatusExport, StatusTransfer
+
+live_row = column("deleted_at") == None
+search_config = literal_column("'simple'::regconfig")
+trigram_extension = "pg_trgm"
+
+
+def has_trigrams(connection: Connection) -> bool:
+    stmt = text("SELECT EXISTS (SELECT FROM pg_extension WHERE extname = :name)")
+    return bool(connection.scalar(stmt, {"name": trigram_extension}))
 
 
 class BaseModel(DeclarativeBase):
     __abstract__ = True
+    type_annotation_map = {datetime: DateTime(timezone=True)}
 
     id: Mapped[int] = mapped_column(primary_key=True)
     deleted_at: Mapped[datetime | None] = mapped_column(nullable=True, default=None)
+    # bumped by every UPDATE the ORM flushes, including soft deletes; backs the ETags
+    version: Mapped[int] = mapped_column(default=1, server_default=text("1"), onupdate=literal_column("version") + 1)
 
     @declared_attr.directive
     def __table_args__(cls) -> tuple[Index, ...]:
-        return (Index(f"{cls.__tablename__}_not_deleted_at", "id", postgresql_where=(column("deleted_at") != None)),)
+        return (Index(f"{cls.__tablename__}_not_deleted_at", "id", postgresql_where=live_row),)
 
 
 class Account(BaseModel):
@@ -59,6 +91,89 @@ class Money(BaseModel):
     mint: Mapped[int] = mapped_column(ForeignKey(Mint.id), nullable=False)
     issuing_state: Mapped[int] = mapped_column(ForeignKey(IssuingState.id), nullable=False)
 
+    # every field of OrderingScheme and FiltrationScheme except the free text description
+    indexed_fields = (
+        "nominal_price",
+        "release_year",
+        "serial_number",
+        "type_money",
+        "currency",
+        "mint",
+        "issuing_state",
+    )
+
+    @declared_attr.directive
+    def __table_args__(cls) -> tuple[Index, ...]:
+        return (
+            Index("money_user", "user", "id", postgresql_where=live_row),
+            *[
+                Index(f"money_user_{field}", "user", field, "id", postgresql_where=live_row)
+                for field in cls.indexed_fields
+            ],
+            Index(
+                "money_description_search",
+                func.to_tsvector(search_config, column("description")),
+                postgresql_using="gin",
+            ).ddl_if(dialect="postgresql"),
+            Index(
+                "money_serial_number_trgm",
+                "serial_number",
+                postgresql_using="gin",
+                postgresql_ops={"serial_number": "gin_trgm_ops"},
+            ).ddl_if(dialect="postgresql", callable_=lambda ddl, target, bind, **kw: has_trigrams(bind)),
+        ) + super().__table_args__
+
+
+description_vector = func.to_tsvector(search_config, Money.description)
+
+
+@event.listens_for(Money.__table__, "before_create")
+def create_trigram_extension(target: Table, connection: Connection, **kw: Any) -> None:
+    """pg_trgm ships with the contrib package; without it serial numbers are matched by prefix only."""
+
+    if connection.dialect.name != "postgresql":
+        return
+
+    stmt = text("SELECT EXISTS (SELECT FROM pg_available_extensions WHERE name = :name)")
+    if connection.scalar(stmt, {"name": trigram_extension}):
+        connection.execute(text(f"CREATE EXTENSION IF NOT EXISTS {trigram_extension}"))
+
+
+# statements that complete a created table, by dialect; `db_scheme.migrate` runs them when it adds the table's parts
+money_search_ddl = {
+    "sqlite": [
+        DDL(
+            "CREATE VIRTUAL TABLE money_search USING fts5(description, serial_number, content='money', "
+            "content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        ),
+        DDL(
+            "CREATE TRIGGER money_search_insert AFTER INSERT ON money BEGIN "
+            "INSERT INTO money_search(rowid, description, serial_number) "
+            "VALUES (new.id, new.description, new.serial_number); "
+            "END"
+        ),
+        DDL(
+            "CREATE TRIGGER money_search_delete AFTER DELETE ON money BEGIN "
+            "INSERT INTO money_search(money_search, rowid, description, serial_number) "
+            "VALUES ('delete', old.id, old.description, old.serial_number); "
+            "END"
+        ),
+        DDL(
+            "CREATE TRIGGER money_search_update AFTER UPDATE OF description, serial_number ON money BEGIN "
+            "INSERT INTO money_search(money_search, rowid, description, serial_number) "
+            "VALUES ('delete', old.id, old.description, old.serial_number); "
+            "INSERT INTO money_search(rowid, description, serial_number) "
+            "VALUES (new.id, new.description, new.serial_number); "
+            "END"
+        ),
+    ]
+}
+for dialect, ddls in money_search_ddl.items():
+    for ddl in ddls:
+        event.listen(Money.__table__, "after_create", ddl.execute_if(dialect=dialect))
+
+event.listen(Money.__table__, "before_drop", DDL("DROP TABLE IF EXISTS money_search").execute_if(dialect="sqlite"))
+
 
 initial_status = column("status") == StatusTransfer.initial.value
 
@@ -74,11 +189,97 @@ class Transfer(BaseModel):
     comment: Mapped[str] = mapped_column(String(100))
     money: Mapped[int] = mapped_column(ForeignKey(Money.id), nullable=False)
     status: Mapped[StatusTransfer]
+    # assigned by the database on insert and on every status change, see the triggers below
+    change_seq: Mapped[int] = mapped_column(BigInteger, server_default=text("0"), server_onupdate=FetchedValue())
 
     @declared_attr.directive
     def __table_args__(cls) -> tuple[Index, ...]:
         return (
-            Index("activ_destination", "destination", postgresql_where=(initial_status)),
-            Index("activ_transfer", "id", postgresql_where=(initial_status)),
+            Index("activ_destination", "destination", "id", postgresql_where=(initial_status & live_row)),
+            Index("activ_transfer", "id", postgresql_where=(initial_status & live_row)),
             Index("uniq_transfer", "source", "money", unique=True, postgresql_where=(initial_status)),
+            Index("transfer_destination_change_seq", "destination", "change_seq"),
+            Index("transfer_change_seq_max", "change_seq").ddl_if(dialect="sqlite"),
         ) + super().__table_args__
+
+
+transfer_change_seq = Sequence("transfer_change_seq", metadata=BaseModel.metadata)
+transfer_change_columns = "status, closed_at, deleted_at"
+# the recipient's lock taken by the PostgreSQL trigger, formatted with the recipient id
+transfer_destination_lock = "pg_advisory_xact_lock(hashtext('transfer_destination'), {})"
+
+# SQLite runs one writer at a time, so the next number is simply the largest one plus one
+next_change_seq = (
+    "UPDATE transfer SET change_seq = (SELECT coalesce(max(change_seq), 0) + 1 FROM transfer) WHERE id = new.id;"
+)
+transfer_change_seq_ddl = {
+    # The transaction that takes a number holds the recipient's advisory lock until it ends, so for every
+    # recipient the numbers become visible in increasing order and a poll never skips a slower commit.
+    "postgresql": [
+        DDL(
+            "CREATE OR REPLACE FUNCTION transfer_change_seq() RETURNS trigger AS $$ BEGIN "
+            f"PERFORM {transfer_destination_lock.format('NEW.destination')}; "
+            "NEW.change_seq := nextval('transfer_change_seq'); "
+            "RETURN NEW; "
+            "END $$ LANGUAGE plpgsql"
+        ),
+        DDL(
+            f"CREATE TRIGGER transfer_change_seq BEFORE INSERT OR UPDATE OF {transfer_change_columns} ON transfer "
+            "FOR EACH ROW EXECUTE FUNCTION transfer_change_seq()"
+        ),
+    ],
+    "sqlite": [
+        DDL(f"CREATE TRIGGER transfer_change_seq_insert AFTER INSERT ON transfer BEGIN {next_change_seq} END"),
+        DDL(
+            f"CREATE TRIGGER transfer_change_seq_update AFTER UPDATE OF {transfer_change_columns} ON transfer "
+            f"BEGIN {next_change_seq} END"
+        ),
+    ],
+}
+for dialect, ddls in transfer_change_seq_ddl.items():
+    for ddl in ddls:
+        event.listen(Transfer.__table__, "after_create", ddl.execute_if(dialect=dialect))
+
+event.listen(
+    Transfer.__table__,
+    "after_drop",
+    DDL("DROP FUNCTION IF EXISTS transfer_change_seq()").execute_if(dialect="postgresql"),
+)
+
+
+class ExportJob(BaseModel):
+    __tablename__ = "export_job"
+
+    user: Mapped[int] = mapped_column(ForeignKey(Account.id), nullable=False)
+    status: Mapped[StatusExport]
+    format: Mapped[str] = mapped_column(String(10))
+    filters: Mapped[dict[str, Any]] = mapped_column(JSON)
+    order_by: Mapped[dict[str, str]] = mapped_column(JSON)
+    # coins created after the job was started are left out of the file
+    max_money_id: Mapped[int]
+    total: Mapped[int]
+    rows: Mapped[int] = mapped_column(default=0)
+    created_at: Mapped[datetime]
+    finished_at: Mapped[datetime | None] = mapped_column(nullable=True, default=None)
+    expires_at: Mapped[datetime]
+    # renewed by the worker process that runs the job; a job whose lease lapsed is failed by any other process
+    heartbeat_at: Mapped[datetime]
+
+    @declared_attr.directive
+    def __table_args__(cls) -> tuple[Index, ...]:
+        return (
+            Index("export_job_user", "user", "id", postgresql_where=live_row),
+            Index("export_job_expires_at", "expires_at", postgresql_where=live_row),
+        ) + super().__table_args__
+
+
+money_stats = Table(
+    "money_stats",
+    BaseModel.metadata,
+    Column("user", ForeignKey(Account.id), primary_key=True),
+    Column("field", String(20), primary_key=True),
+    Column("value", String(30), primary_key=True),
+    Column("coins", Integer, nullable=False),
+    Column("nominal_price", BigInteger, nullable=False),
+    Index("money_stats_field", "field", "value"),
+)
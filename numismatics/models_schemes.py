@@ -1,7 +1,13 @@
 from datetime import datetime
+from typing import Generic, TypeVar
+
+from pydantic import StrictInt
+from pydantic.generics import GenericModel
 
 from .schemes import BaseScheme
-from .types import StatusTransfer
+from .types import StatusExport, StatusTransfer
+
+ItemSchemeT = TypeVar("ItemSchemeT", bound=BaseScheme)
 
 
 class BaseModelScheme(BaseScheme):
@@ -41,3 +47,55 @@ class TransferModelScheme(BaseModelScheme):
     comment: str
     money: int
     status: StatusTransfer
+
+
+class TransferChangeScheme(TransferModelScheme):
+    deleted_at: datetime | None = None
+
+
+class TransferChangesScheme(BaseScheme):
+    items: list[TransferChangeScheme]
+    token: str
+    has_more: bool = False
+
+
+class ExportJobModelScheme(BaseModelScheme):
+    status: StatusExport
+    format: str
+    rows: int
+    total: int
+    created_at: datetime
+    finished_at: datetime | None = None
+    expires_at: datetime
+
+
+class MoneyStatsScheme(BaseScheme):
+    value: StrictInt | str
+    count: int
+    nominal_price: int
+
+
+class PageScheme(GenericModel, Generic[ItemSchemeT]):
+    items: list[ItemSchemeT]
+    next_cursor: str | None = None
+
+    class Config:
+        orm_mode = True
+
+
+class BatchItemScheme(GenericModel, Generic[ItemSchemeT]):
+    item: ItemSchemeT | None = None
+    error: str | None = None
+    fields: list[str] = []
+
+
+class ImportErrorScheme(BaseScheme):
+    line: int
+    error: str
+    fields: list[str] = []
+
+
+class ImportReportScheme(BaseScheme):
+    accepted: int = 0
+    rejected: int = 0
+    errors: list[ImportErrorScheme] = []
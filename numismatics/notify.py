@@ -0,0 +1,161 @@
+import asyncio
+import logging
+from collections.abc import Sequence
+from typing import Any
+
+import orjson
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from . import env
+from .cache import on_commit
+from .db import engine
+
+logger = logging.getLogger(__name__)
+
+Change = dict[str, Any]
+
+channel = "transfer_changes"
+# NOTIFY payloads are limited to 8000 bytes
+max_payload = 7900
+
+
+class Listener:
+    """The worker's single `LISTEN` connection; psycopg2 notifications are read on the event loop."""
+
+    def __init__(self, broker: "Broker", loop: asyncio.AbstractEventLoop) -> None:
+        self.broker = broker
+        self.loop = loop
+        self.connection = engine.raw_connection()
+        self.dbapi_connection = self.connection.driver_connection
+        # kept out of the pool: the connection stays in autocommit and listening for the life of the worker
+        self.connection.detach()
+        self.dbapi_connection.autocommit = True
+        with self.dbapi_connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {channel}")
+
+        loop.add_reader(self.dbapi_connection.fileno(), self.read)
+
+    def read(self) -> None:
+        try:
+            self.dbapi_connection.poll()
+        except Exception:
+            logger.exception("lost the %s listener connection", channel)
+            self.broker.reset()
+            return
+
+        changes: list[Change] = []
+        while self.dbapi_connection.notifies:
+            changes.extend(orjson.loads(self.dbapi_connection.notifies.pop(0).payload))
+
+        self.broker.dispatch(changes)
+
+    def close(self) -> None:
+        self.loop.remove_reader(self.dbapi_connection.fileno())
+        self.connection.close()
+
+
+class Broker:
+    """Stream subscribers of this worker by recipient. Changes are fanned out to bounded queues on the event loop;
+    a subscriber that falls behind is closed and resumes from its last event id."""
+
+    def __init__(self, queue_size: int, listen: bool) -> None:
+        self.queue_size = queue_size
+        self.listen = listen
+        self.subscribers: dict[int, set[asyncio.Queue[Change | None]]] = {}
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.listener: Listener | None = None
+
+    def subscribe(self, destination: int) -> asyncio.Queue[Change | None]:
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop:
+            self.reset()
+            self.loop = loop
+
+        if self.listen and self.listener is None:
+            self.listener = Listener(self, loop)
+
+        queue: asyncio.Queue[Change | None] = asyncio.Queue(self.queue_size)
+        self.subscribers.setdefault(destination, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, destination: int, queue: asyncio.Queue[Change | None]) -> None:
+        if (queues := self.subscribers.get(destination)) is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[destination]
+
+    def publish(self, changes: Sequence[Change]) -> None:
+        """Fan out from any thread."""
+
+        if self.loop is not None and self.subscribers:
+            self.loop.call_soon_threadsafe(self.dispatch, changes)
+
+    def dispatch(self, changes: Sequence[Change]) -> None:
+        for change in changes:
+            for queue in tuple(self.subscribers.get(change["destination"], ())):
+                try:
+                    queue.put_nowait(change)
+                except asyncio.QueueFull:
+                    self.close_queue(change["destination"], queue)
+
+    def close_queue(self, destination: int, queue: asyncio.Queue[Change | None]) -> None:
+        self.unsubscribe(destination, queue)
+        while not queue.empty():
+            queue.get_nowait()
+
+        queue.put_nowait(None)
+
+    def reset(self) -> None:
+        """Close every stream and the listener; the next subscriber starts a new one."""
+
+        for destination, queues in list(self.subscribers.items()):
+            for queue in tuple(queues):
+                self.close_queue(destination, queue)
+
+        if self.listener is not None:
+            listener, self.listener = self.listener, None
+            try:
+                listener.close()
+            except Exception:
+                logger.exception("failed to close the %s listener connection", channel)
+
+
+def uses_notify() -> bool:
+    return engine.dialect.name == "postgresql" and engine.dialect.driver == "psycopg2"
+
+
+broker = Broker(env.STREAM_QUEUE_SIZE, uses_notify())
+
+
+def publish(session: Session, changes: Sequence[Change]) -> None:
+    """Send the changes to the stream subscribers of every worker once the session commits: with `NOTIFY` on
+    PostgreSQL, through the in-process broker elsewhere."""
+
+    if not changes:
+        return
+
+    if broker.listen:
+        params = [{"channel": channel, "payload": payload} for payload in pack(changes)]
+        session.execute(text("SELECT pg_notify(:channel, :payload)"), params)
+    else:
+        on_commit(session, lambda: broker.publish(changes))
+
+
+def pack(changes: Sequence[Change]) -> list[str]:
+    """JSON arrays of changes that fit into one NOTIFY payload each."""
+
+    payloads: list[bytes] = []
+    parts: list[bytes] = []
+    size = 0
+    for change in changes:
+        part = orjson.dumps(change)
+        if parts and size + len(part) + 1 > max_payload:
+            payloads.append(b"[%s]" % b",".join(parts))
+            parts, size = [], 0
+
+        parts.append(part)
+        size += len(part) + 1
+
+    payloads.append(b"[%s]" % b",".join(parts))
+    return [payload.decode() for payload in payloads]
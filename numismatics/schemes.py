@@ -1,6 +1,6 @@
 from typing import Any, Literal
 
-from pydantic import BaseModel, PositiveInt, validator
+from pydantic import BaseModel, Field, PositiveInt, conlist, validator
 
 
 def validate_length_str(field: str, length: int) -> Any:
@@ -44,6 +44,13 @@ class CreateMoneyScheme(BaseScheme):
     serial_number_length = validate_length_str("serial_number", 30)
 
 
+CreateMoneyBatchScheme = conlist(CreateMoneyScheme, min_items=1, max_items=10000)
+
+
+class ImportMoneyScheme(CreateMoneyScheme):
+    user: PositiveInt | None = None
+
+
 class CreateTransferScheme(BaseScheme):
     source: PositiveInt
     destination: PositiveInt
@@ -53,6 +60,9 @@ class CreateTransferScheme(BaseScheme):
     comment_length = validate_length_str("comment", 100)
 
 
+TransferIdsScheme = conlist(PositiveInt, min_items=1, max_items=1000, unique_items=True)
+
+
 class FiltrationScheme(BaseScheme):
     id: PositiveInt | None = None
     description: str | None = None
@@ -82,3 +92,18 @@ class OrderingScheme(BaseScheme):
     currency: AscDesc | None = None
     mint: AscDesc | None = None
     issuing_state: AscDesc | None = None
+
+
+StatsField = Literal["type_money", "currency", "mint", "issuing_state", "release_year"]
+
+
+CountMode = Literal["exact", "estimate"]
+
+
+ExportFormat = Literal["csv", "ndjson", "arrow"]
+
+
+class PaginationScheme(BaseScheme):
+    limit: int = Field(100, ge=1, le=1000)
+    cursor: str | None = None
+    count: CountMode | None = None
@@ -0,0 +1,82 @@
+from typing import Any, Literal
+
+from pydantic import BaseSettings
+from sqlalchemy import Engine, event, make_url
+from sqlalchemy.engine import URL
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, Pool, QueuePool
+
+
+class EngineSettings(BaseSettings):
+    profile: Literal["default", "pgbouncer"] = "default"
+    pool_class: Literal["queue", "null"] = "queue"
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30
+    pool_recycle: int = -1
+    pool_pre_ping: bool = False
+    echo: bool = False
+    statement_timeout: int | None = None
+    executemany_mode: Literal["values_only", "values_plus_batch"] | None = None
+
+    class Config:
+        env_prefix = "FAST_DB_"
+
+    def get_engine_options(self, url: str) -> dict[str, Any]:
+        """Keyword arguments for `create_engine`/`create_async_engine` of the given database URL."""
+
+        parsed_url = make_url(url)
+        driver = parsed_url.get_driver_name()
+        is_async = driver in ("asyncpg", "aiosqlite")
+        options: dict[str, Any] = {
+            "echo": self.echo,
+            "pool_recycle": self.pool_recycle,
+            "pool_pre_ping": self.pool_pre_ping,
+        }
+        # an in-memory SQLite database lives in its connection, so it keeps the dialect's own pool
+        if not is_memory_sqlite(parsed_url):
+            options["poolclass"] = self.get_pool_class(is_async)
+            if options["poolclass"] is not NullPool:
+                options.update(pool_size=self.pool_size, max_overflow=self.max_overflow, pool_timeout=self.pool_timeout)
+
+        if driver == "psycopg2" and self.executemany_mode is not None:
+            options["executemany_mode"] = self.executemany_mode
+
+        connect_args: dict[str, Any] = {}
+        # PgBouncer rejects startup parameters, there the timeout is set per transaction by `configure_engine`
+        if self.statement_timeout is not None and driver == "psycopg2" and self.profile != "pgbouncer":
+            connect_args["options"] = f"-c statement_timeout={self.statement_timeout}"
+
+        if self.statement_timeout is not None and driver == "asyncpg" and self.profile != "pgbouncer":
+            connect_args["server_settings"] = {"statement_timeout": str(self.statement_timeout)}
+
+        if self.profile == "pgbouncer" and driver == "asyncpg":
+            connect_args.update(prepared_statement_cache_size=0, statement_cache_size=0)
+
+        if connect_args:
+            options["connect_args"] = connect_args
+
+        return options
+
+    def configure_engine(self, engine: Engine) -> None:
+        """Engine hooks the options cannot express. Under PgBouncer the statement timeout is set with `SET LOCAL` at
+        the start of every transaction: in transaction pooling a session-level `SET` would stay on a server
+        connection that other clients get next."""
+
+        if self.profile == "pgbouncer" and self.statement_timeout is not None and engine.dialect.name == "postgresql":
+            statement = f"SET LOCAL statement_timeout = {self.statement_timeout}"
+            event.listen(engine, "begin", lambda connection: connection.exec_driver_sql(statement))
+
+    def get_pool_class(self, is_async: bool) -> type[Pool]:
+        if self.profile == "pgbouncer" or self.pool_class == "null":
+            return NullPool
+
+        return AsyncAdaptedQueuePool if is_async else QueuePool
+
+
+def is_memory_sqlite(url: URL) -> bool:
+    return url.get_backend_name() == "sqlite" and (
+        url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+    )
+
+
+engine_settings = EngineSettings()
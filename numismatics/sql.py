@@ -1,15 +1,41 @@
-from collections.abc import Sequence
-from typing import Callable, TypeAlias, TypeVar
+import base64
+import binascii
+import csv
+import json
+from collections.abc import Iterable, Iterator, Sequence
+from functools import lru_cache
+from io import StringIO
+from typing import Any, Callable, Generic, NamedTuple, TypeAlias, TypeVar
 
-from sqlalchemy import ColumnElement, Select, select
-from sqlalchemy.orm import Session
+from sqlalchemy import ColumnElement, Row, Select, and_, bindparam, func, insert, or_, select, text, tuple_
+from sqlalchemy.orm import InstrumentedAttribute, Session
+from sqlalchemy.sql.expression import asc, desc
 
+from .errors import InvalidCursorError
 from .models import BaseModel
+from .schemes import PaginationScheme
 
 ModelT = TypeVar("ModelT", bound=BaseModel)
+ItemT = TypeVar("ItemT")
 OneModelStatement: TypeAlias = Select[tuple[ModelT]]
 SelectT = TypeVar("SelectT", bound=Select)
-OneModelFiltration: TypeAlias = Callable[[SelectT], SelectT]
+Criteria: TypeAlias = Callable[[SelectT], SelectT]
+SortKeys: TypeAlias = list[tuple[InstrumentedAttribute[Any], str]]
+
+
+class OneModelFiltration(NamedTuple, Generic[SelectT]):
+    """`criteria` is a module function or method that adds `bindparam` placeholders, `params` holds their values.
+
+    Statements are cached per `(model, criteria)`, so `criteria` must not close over request values.
+    """
+
+    criteria: Criteria[SelectT]
+    params: dict[str, Any] = {}
+
+
+class Page(NamedTuple, Generic[ItemT]):
+    items: Sequence[ItemT]
+    next_cursor: str | None
 
 
 def get_instance_by_id(
@@ -18,7 +44,8 @@ def get_instance_by_id(
     model: type[ModelT],
     filtration: OneModelFiltration[OneModelStatement[ModelT]] | None = None,
 ) -> ModelT | None:
-    return session.scalar(select_and_filter(model, filtration).where(model.id == obj_id))
+    stmt = get_instance_statement(model, get_criteria(filtration))
+    return session.scalar(stmt, {**get_params(filtration), "obj_id": obj_id})
 
 
 def get_all_instance(
@@ -26,18 +53,240 @@ def get_all_instance(
     model: type[ModelT],
     filtration: OneModelFiltration[OneModelStatement[ModelT]] | None = None,
 ) -> Sequence[ModelT]:
-    return session.scalars(select_and_filter(model, filtration).order_by(model.id)).all()
+    return session.scalars(get_all_statement(model, get_criteria(filtration)), get_params(filtration)).all()
+
+
+@lru_cache(maxsize=256)
+def get_instance_statement(
+    model: type[ModelT], criteria: Criteria[OneModelStatement[ModelT]] | None
+) -> OneModelStatement[ModelT]:
+    return get_filtered_statement(model, criteria).where(model.id == bindparam("obj_id"))
+
+
+@lru_cache(maxsize=256)
+def get_all_statement(
+    model: type[ModelT], criteria: Criteria[OneModelStatement[ModelT]] | None
+) -> OneModelStatement[ModelT]:
+    return get_filtered_statement(model, criteria).order_by(model.id)
+
+
+def get_page(
+    session: Session,
+    model: type[ModelT],
+    pagination: PaginationScheme,
+    filtration: OneModelFiltration[OneModelStatement[ModelT]] | None = None,
+    order_by: dict[str, str] | None = None,
+) -> Page[ModelT]:
+    sort_keys = get_sort_keys(model, order_by or {})
+    stmt = get_page_statement(select_and_filter(model, filtration), sort_keys, pagination)
+    return make_page(session.scalars(stmt, get_params(filtration)).all(), sort_keys, pagination)
+
+
+def get_rows_page(
+    session: Session,
+    model: type[ModelT],
+    columns: Sequence[str],
+    pagination: PaginationScheme,
+    filtration: OneModelFiltration[OneModelStatement[ModelT]] | None = None,
+    order_by: dict[str, str] | None = None,
+) -> Page[Row[Any]]:
+    """Same page as `get_page`, but as plain rows of `columns` (sort keys are appended when missing)."""
+
+    sort_keys = get_sort_keys(model, order_by or {})
+    attrs = [getattr(model, column) for column in columns]
+    attrs += [attr for attr, _ in sort_keys if attr.key not in columns]
+    stmt = get_page_statement(select_and_filter(model, filtration), sort_keys, pagination)
+    rows = session.execute(stmt.with_only_columns(*attrs), get_params(filtration)).all()
+    return make_page(rows, sort_keys, pagination)
+
+
+def count_rows(
+    session: Session, model: type[ModelT], filtration: OneModelFiltration[OneModelStatement[ModelT]] | None = None
+) -> int:
+    return session.scalar(get_count_statement(model, get_criteria(filtration)), get_params(filtration))
+
+
+def estimate_rows(
+    session: Session, model: type[ModelT], filtration: OneModelFiltration[OneModelStatement[ModelT]] | None = None
+) -> int:
+    """Planner row estimate for the filtered list, PostgreSQL only (other dialects count exactly)."""
+
+    dialect = session.get_bind().dialect
+    if dialect.name != "postgresql":
+        return count_rows(session, model, filtration)
+
+    stmt = select_and_filter(model, filtration).params(get_params(filtration))
+    compiled = stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+    plan = session.scalar(text(f"EXPLAIN (FORMAT JSON) {compiled}"))
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+@lru_cache(maxsize=256)
+def get_count_statement(
+    model: type[ModelT], criteria: Criteria[OneModelStatement[ModelT]] | None
+) -> Select[tuple[int]]:
+    return get_filtered_statement(model, criteria).with_only_columns(func.count(), maintain_column_froms=True)
+
+
+def get_page_statement(stmt: SelectT, sort_keys: SortKeys, pagination: PaginationScheme) -> SelectT:
+    stmt = stmt.order_by(*[get_order_clause(attr, sort) for attr, sort in sort_keys])
+    if pagination.cursor is not None:
+        stmt = stmt.where(get_filter_after(sort_keys, decode_cursor(pagination.cursor, sort_keys)))
+
+    return stmt.limit(pagination.limit + 1)
+
+
+def make_page(items: Sequence[ItemT], sort_keys: SortKeys, pagination: PaginationScheme) -> Page[ItemT]:
+    if len(items) <= pagination.limit:
+        return Page(items, None)
+
+    items = items[: pagination.limit]
+    return Page(items, encode_cursor(sort_keys, [getattr(items[-1], attr.key) for attr, _ in sort_keys]))
+
+
+def stream_partitions(
+    session: Session, stmt: Select[Any], size: int, params: dict[str, Any] | None = None
+) -> Iterator[Sequence[Row[Any]]]:
+    yield from session.execute(stmt.execution_options(yield_per=size), params).partitions()
+
+
+def bulk_insert(
+    session: Session, model: type[BaseModel], columns: Sequence[str], chunks: Iterable[Sequence[dict[str, Any]]]
+) -> None:
+    """Insert rows chunk by chunk: COPY into a staging table on psycopg2, executemany elsewhere."""
+
+    if session.get_bind().dialect.driver != "psycopg2":
+        for chunk in chunks:
+            if chunk:
+                session.execute(insert(model), chunk)
+
+        return
+
+    table, staging, names = model.__tablename__, f"{model.__tablename__}_import", ", ".join(f'"{c}"' for c in columns)
+    session.execute(text(f"CREATE TEMP TABLE {staging} AS SELECT {names} FROM {table} WITH NO DATA"))
+    cursor = session.connection().connection.cursor()
+    for chunk in chunks:
+        buffer_file = StringIO()
+        csv.writer(buffer_file).writerows([row[column] for column in columns] for row in chunk)
+        buffer_file.seek(0)
+        cursor.copy_expert(f"COPY {staging} ({names}) FROM STDIN WITH (FORMAT csv)", buffer_file)
+
+    session.execute(text(f"INSERT INTO {table} ({names}) SELECT {names} FROM {staging}"))
+    session.execute(text(f"DROP TABLE {staging}"))
+
+
+def lock_instances(
+    session: Session,
+    model: type[ModelT],
+    ids: Iterable[int],
+    filtration: OneModelFiltration[OneModelStatement[ModelT]] | None = None,
+) -> tuple[dict[int, ModelT], set[int]]:
+    """Lock the rows of `ids` in id order, skipping rows other transactions hold; returns them and the skipped ids.
+
+    A consistent order keeps concurrent batches from deadlocking, and the skipped ids can be retried later.
+    """
+
+    if not (ids := set(ids)):
+        return {}, set()
+
+    stmt = select_and_filter(model, filtration).where(model.id.in_(ids)).order_by(model.id)
+    locked = {obj.id: obj for obj in session.scalars(stmt.with_for_update(skip_locked=True), get_params(filtration))}
+    if not (missing := ids - locked.keys()):
+        return locked, set()
+
+    stmt = stmt.where(model.id.in_(missing)).with_only_columns(model.id)
+    return locked, set(session.scalars(stmt, get_params(filtration)))
 
 
 def select_and_filter(
     model: type[ModelT], filtration: OneModelFiltration[OneModelStatement[ModelT]] | None = None
+) -> OneModelStatement[ModelT]:
+    return get_filtered_statement(model, get_criteria(filtration))
+
+
+@lru_cache(maxsize=256)
+def get_filtered_statement(
+    model: type[ModelT], criteria: Criteria[OneModelStatement[ModelT]] | None
 ) -> OneModelStatement[ModelT]:
     stmt = select(model).where(get_filter_by_existing(model))
-    if filtration is not None:
-        stmt = filtration(stmt)
+    if criteria is not None:
+        stmt = criteria(stmt)
 
     return stmt
 
 
+def get_criteria(filtration: OneModelFiltration[SelectT] | None) -> Criteria[SelectT] | None:
+    return None if filtration is None else filtration.criteria
+
+
+def get_params(filtration: OneModelFiltration[Any] | None) -> dict[str, Any]:
+    return {} if filtration is None else filtration.params
+
+
+def with_for_update(stmt: SelectT) -> SelectT:
+    return stmt.with_for_update()
+
+
+FOR_UPDATE: OneModelFiltration[Any] = OneModelFiltration(with_for_update)
+
+
 def get_filter_by_existing(model: type[BaseModel]) -> ColumnElement[bool]:
     return model.deleted_at == None
+
+
+def get_sort_keys(model: type[BaseModel], order_by: dict[str, str]) -> SortKeys:
+    keys: SortKeys = []
+    for field, sort in order_by.items():
+        keys.append((getattr(model, field), sort))
+        if field == "id":
+            return keys
+
+    # id follows the last direction, so a single-field ordering is served by one (field, id) index scan
+    return keys + [(model.id, keys[-1][1] if keys else "+")]
+
+
+def get_order_clause(attr: InstrumentedAttribute[Any], sort: str) -> ColumnElement[Any]:
+    return asc(attr) if sort == "+" else desc(attr)
+
+
+def get_filter_after(sort_keys: SortKeys, values: list[Any]) -> ColumnElement[bool]:
+    if len({sort for _, sort in sort_keys}) == 1:
+        row, after = tuple_(*[attr for attr, _ in sort_keys]), tuple_(*values)
+        return row > after if sort_keys[0][1] == "+" else row < after
+
+    return or_(
+        *[
+            and_(
+                *[attr == value for (attr, _), value in zip(sort_keys[:i], values)],
+                attr > value if sort == "+" else attr < value,
+            )
+            for i, ((attr, sort), value) in enumerate(zip(sort_keys, values))
+        ]
+    )
+
+
+def get_cursor_ordering(sort_keys: SortKeys) -> str:
+    return ",".join(f"{sort}{attr.key}" for attr, sort in sort_keys)
+
+
+def encode_cursor(sort_keys: SortKeys, values: list[Any]) -> str:
+    payload = json.dumps([get_cursor_ordering(sort_keys), values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str, sort_keys: SortKeys) -> list[Any]:
+    try:
+        ordering, values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError) as exc:
+        raise InvalidCursorError(cursor) from exc
+
+    if ordering != get_cursor_ordering(sort_keys) or not isinstance(values, list) or len(values) != len(sort_keys):
+        raise InvalidCursorError(cursor)
+
+    if not all(isinstance(value, attr.type.python_type) for (attr, _), value in zip(sort_keys, values)):
+        raise InvalidCursorError(cursor)
+
+    return values
@@ -0,0 +1,128 @@
+from collections import defaultdict
+from collections.abc import Iterable, Mapping
+from typing import Any, get_args
+
+from sqlalchemy import BigInteger, String, cast, delete, event, func, insert, inspect, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import sql
+from .models import Money, money_stats
+from .schemes import StatsField
+
+FIELDS: tuple[str, ...] = get_args(StatsField)
+TRACKED_FIELDS = ("user", "nominal_price", "deleted_at", *FIELDS)
+
+
+def track(session: Session, rows: Iterable[Mapping[str, Any]], sign: int = 1) -> None:
+    """Add (or with `sign=-1` remove) live coins to the per-user aggregates written on commit."""
+
+    deltas = session.info.setdefault("money_stats", defaultdict(lambda: [0, 0]))
+    for row in rows:
+        for field in FIELDS:
+            delta = deltas[(row["user"], field, str(row[field]))]
+            delta[0] += sign
+            delta[1] += sign * row["nominal_price"]
+
+
+def get_values(obj: Money, old: bool = False) -> dict[str, Any]:
+    if not old:
+        return {field: getattr(obj, field) for field in TRACKED_FIELDS}
+
+    values = {}
+    for field in TRACKED_FIELDS:
+        history = inspect(obj).attrs[field].history
+        values[field] = history.deleted[0] if history.deleted else getattr(obj, field)
+
+    return values
+
+
+def get_groups(session: Session, field: str, user_id: int | None = None) -> list[dict[str, Any]]:
+    value, coins, nominal_price = money_stats.c.value, money_stats.c.coins, money_stats.c.nominal_price
+    if user_id is None:
+        total_coins = cast(func.sum(coins), BigInteger)
+        stmt = select(value, total_coins, cast(func.sum(nominal_price), BigInteger)).group_by(value)
+        stmt = stmt.where(money_stats.c.field == field).having(total_coins > 0)
+    else:
+        stmt = select(value, coins, nominal_price).where(
+            money_stats.c.user == user_id, money_stats.c.field == field, coins > 0
+        )
+
+    convert = str if field == "release_year" else int
+    groups = [
+        {"value": convert(key), "count": count, "nominal_price": total} for key, count, total in session.execute(stmt)
+    ]
+    return sorted(groups, key=lambda group: group["value"])
+
+
+def count_coins(session: Session, user_id: int) -> int:
+    # each live coin is counted once per field, so a single field sums to the total
+    stmt = select(func.coalesce(func.sum(money_stats.c.coins), 0)).where(
+        money_stats.c.user == user_id, money_stats.c.field == "type_money"
+    )
+    return int(session.scalar(stmt))
+
+
+def rebuild(session: Session) -> None:
+    """Recompute the aggregates from the live coins, for existing databases and bulk loads."""
+
+    session.execute(delete(money_stats))
+    for field in FIELDS:
+        column = getattr(Money, field)
+        stmt = (
+            select(Money.user, literal(field), cast(column, String), func.count(), func.sum(Money.nominal_price))
+            .where(sql.get_filter_by_existing(Money))
+            .group_by(Money.user, column)
+        )
+        session.execute(insert(money_stats).from_select([c.name for c in money_stats.columns], stmt))
+
+
+@event.listens_for(Session, "before_flush")
+def track_money_changes(session: Session, flush_context: Any, instances: Any) -> None:
+    for obj in session.new:
+        if isinstance(obj, Money) and obj.deleted_at is None:
+            track(session, [get_values(obj)])
+
+    for obj in session.dirty:
+        if isinstance(obj, Money) and session.is_modified(obj):
+            old, new = get_values(obj, old=True), get_values(obj)
+            if old != new:
+                track(session, [old] if old["deleted_at"] is None else [], -1)
+                track(session, [new] if new["deleted_at"] is None else [])
+
+    for obj in session.deleted:
+        if isinstance(obj, Money) and (old := get_values(obj, old=True))["deleted_at"] is None:
+            track(session, [old], -1)
+
+
+@event.listens_for(Session, "before_commit")
+def write_money_stats(session: Session) -> None:
+    # commit flushes only after this hook, so pending changes are flushed (and tracked) here first
+    session.flush()
+    if not (deltas := session.info.pop("money_stats", None)):
+        return
+
+    # sorted, so that concurrent commits lock the aggregate rows in the same order
+    rows = [
+        {"user": user, "field": field, "value": value, "coins": coins, "nominal_price": nominal_price}
+        for (user, field, value), (coins, nominal_price) in sorted(deltas.items())
+        if coins or nominal_price
+    ]
+    if not rows:
+        return
+
+    dialect = postgresql if session.get_bind().dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(money_stats)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(money_stats.primary_key),
+        set_={
+            "coins": money_stats.c.coins + stmt.excluded.coins,
+            "nominal_price": money_stats.c.nominal_price + stmt.excluded.nominal_price,
+        },
+    )
+    session.execute(stmt, rows)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def forget_money_stats(session: Session, previous_transaction: Any) -> None:
+    session.info.pop("money_stats", None)
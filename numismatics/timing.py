@@ -0,0 +1,110 @@
+import json
+import logging
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Any
+
+from sqlalchemy import Engine, event
+from sqlalchemy.orm import Session
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTimings:
+    __slots__ = ("db", "db_count", "pool_wait", "statement_started", "connection_requested", "handler_finished")
+
+    def __init__(self) -> None:
+        self.db = 0.0
+        self.db_count = 0
+        self.pool_wait = 0.0
+        self.statement_started = 0.0
+        self.connection_requested = 0.0
+        self.handler_finished: float | None = None
+
+    def get_header(self, serialize: float | None) -> str:
+        metrics = [f"db;dur={self.db * 1000:.2f}", f'db-count;desc="{self.db_count}"']
+        metrics.append(f"pool-wait;dur={self.pool_wait * 1000:.2f}")
+        if serialize is not None:
+            metrics.append(f"serialize;dur={serialize * 1000:.2f}")
+
+        return ", ".join(metrics)
+
+
+current_timings: ContextVar[RequestTimings | None] = ContextVar("current_timings", default=None)
+
+
+def mark_handler_finished() -> None:
+    if (timings := current_timings.get()) is not None:
+        timings.handler_finished = perf_counter()
+
+
+class ServerTimingMiddleware:
+    """Collect SQL and serialization timings per request into a Server-Timing header and a log line."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        started = perf_counter()
+        record: dict[str, Any] = {"method": scope["method"], "path": scope["path"]}
+
+        async def send_with_timings(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                serialize = None if timings.handler_finished is None else perf_counter() - timings.handler_finished
+                MutableHeaders(scope=message).append("Server-Timing", timings.get_header(serialize))
+                record.update(
+                    status=message["status"], serialize_ms=None if serialize is None else round(serialize * 1000, 3)
+                )
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            current_timings.reset(token)
+            record.update(
+                total_ms=round((perf_counter() - started) * 1000, 3),
+                db_ms=round(timings.db * 1000, 3),
+                db_count=timings.db_count,
+                pool_wait_ms=round(timings.pool_wait * 1000, 3),
+            )
+            logger.info(json.dumps(record))
+
+
+def before_cursor_execute(*args: Any) -> None:
+    if (timings := current_timings.get()) is not None:
+        timings.statement_started = perf_counter()
+
+
+def after_cursor_execute(*args: Any) -> None:
+    if (timings := current_timings.get()) is not None:
+        timings.db += perf_counter() - timings.statement_started
+        timings.db_count += 1
+
+
+def mark_connection_requested(*args: Any) -> None:
+    if (timings := current_timings.get()) is not None:
+        timings.connection_requested = perf_counter()
+
+
+def after_begin(*args: Any) -> None:
+    if (timings := current_timings.get()) is not None and timings.connection_requested:
+        timings.pool_wait += perf_counter() - timings.connection_requested
+
+
+def instrument_engine(engine: Engine) -> None:
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+
+def instrument_sessions() -> None:
+    event.listen(Session, "do_orm_execute", mark_connection_requested)
+    event.listen(Session, "before_flush", mark_connection_requested)
+    event.listen(Session, "after_begin", after_begin)
@@ -5,3 +5,10 @@ class StatusTransfer(str, Enum):
     initial = "initial"
     approved = "approved"
     declined = "declined"
+
+
+class StatusExport(str, Enum):
+    pending = "pending"
+    running = "running"
+    done = "done"
+    failed = "failed"
@@ -2,17 +2,18 @@ from typing import Literal
 
 import click
 
-from numismatics.db_scheme import create_all, drop_all
+from numismatics.db_scheme import create_all, drop_all, migrate, purge_exports, rebuild_stats, recreate_indexes
 
 
 @click.command()
 @click.option(
     "--db_action",
     default="create",
-    type=click.Choice(["create", "drop"]),
+    type=click.Choice(["create", "drop", "migrate", "indexes", "stats", "exports"]),
 )
-def main(db_action: Literal["create", "drop"]) -> None:
-    """Program for creating or deleting a database."""
+def main(db_action: Literal["create", "drop", "migrate", "indexes", "stats", "exports"]) -> None:
+    """Program for creating, migrating from an earlier version or deleting a database, recreating its indexes,
+    rebuilding the money statistics or purging expired export files."""
 
     if db_action == "create":
         create_all()
@@ -20,6 +21,18 @@ def main(db_action: Literal["create", "drop"]) -> None:
     elif db_action == "drop":
         drop_all()
 
+    elif db_action == "migrate":
+        migrate()
+
+    elif db_action == "indexes":
+        recreate_indexes()
+
+    elif db_action == "stats":
+        rebuild_stats()
+
+    elif db_action == "exports":
+        purge_exports()
+
 
 if __name__ == "__main__":
     main()
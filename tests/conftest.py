@@ -0,0 +1,22 @@
+"""The tests seed and drop their own database: a temporary SQLite file, or `FAST_TEST_DB` (and `FAST_TEST_DB_ASYNC`),
+which must not be the application database of `FAST_DB`/`FAST_DB_ASYNC`."""
+
+import os
+import tempfile
+
+import pytest
+
+app_databases = {os.environ.get("FAST_DB"), os.environ.get("FAST_DB_ASYNC")} - {None}
+test_db = os.environ.get("FAST_TEST_DB") or f"sqlite:///{tempfile.mkdtemp()}/test.db"
+test_async_db = os.environ.get("FAST_TEST_DB_ASYNC")
+if test_db in app_databases or test_async_db in app_databases:
+    raise pytest.UsageError("FAST_TEST_DB is the application database, the tests would drop it")
+
+os.environ["FAST_DB"] = test_db
+if test_async_db:
+    os.environ["FAST_DB_ASYNC"] = test_async_db
+else:
+    os.environ.pop("FAST_DB_ASYNC", None)
+
+for name in ("FAST_DB_REPLICAS", "FAST_DB_ASYNC_REPLICAS"):
+    os.environ.pop(name, None)
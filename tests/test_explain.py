@@ -0,0 +1,170 @@
+"""Every endpoint query is served by an index: with sequential scans disabled, no plan scans a table or sorts a
+page out of many rows. Runs only when FAST_TEST_DB is a PostgreSQL URL with the psycopg2 driver."""
+
+from collections.abc import Iterator
+from dataclasses import dataclass
+from threading import current_thread
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import Engine, event, text
+
+from benchmarks.seed import Fixture, seed
+from numismatics import db, env, exports
+from numismatics.app import app
+
+pytestmark = pytest.mark.skipif(
+    not env.FAST_DB.startswith("postgresql+psycopg2://"),
+    reason="EXPLAIN checks need FAST_TEST_DB with a PostgreSQL psycopg2 URL",
+)
+
+
+@dataclass
+class Check:
+    method: str
+    url: str
+    user: str
+    json: Any = None
+    allow_sort: bool = False
+
+
+def get_checks(fixture: Fixture) -> Iterator[Check]:
+    user, admin = fixture.users[0], fixture.admin
+    coin = fixture.coins[user][0]
+    yield Check("GET", "/money/?limit=100", user)
+    for field in ("id", "nominal_price", "release_year", "serial_number", "type_money", "currency", "mint"):
+        yield Check("GET", f"/money/?limit=100&order_by=-{field}", user)
+        yield Check("GET", f"/money/?limit=100&order_by={field}", user)
+
+    yield Check("GET", "/money/?limit=100&order_by=description", user, allow_sort=True)
+    yield Check("GET", "/money/?limit=100&order_by=nominal_price,-release_year", user, allow_sort=True)
+    yield Check("GET", f"/money/{coin}", user)
+    yield Check("GET", "/money/search?q=coin 12345", user, allow_sort=True)
+    yield Check("GET", "/money/search?q=SN0001234", user, allow_sort=True)
+    yield Check("GET", "/money/stats?group_by=release_year", user)
+    yield Check("GET", "/money/stats/all?group_by=currency", admin)
+    yield Check("GET", "/money/all?limit=100", admin)
+    yield Check("GET", "/money/all?limit=100&order_by=nominal_price", admin, allow_sort=True)
+    yield Check("GET", "/money/upload", user, allow_sort=True)
+    yield Check("GET", "/money/upload?mint=1", user, allow_sort=True)
+    yield Check("GET", "/money/upload?order_by=-issuing_state", user, allow_sort=True)
+    yield Check("GET", "/transfer/?limit=100", user)
+    yield Check("GET", "/transfer/?limit=100", admin)
+    yield Check("GET", "/transfer/changes?limit=100", user)
+    yield Check("GET", "/account/?limit=100", admin)
+    yield Check("GET", "/currency/?limit=100", user)
+    yield Check("GET", "/account/me", user)
+    if fixture.free_coins[user]:
+        destination = fixture.users[1 % len(fixture.users)]
+        scheme = {
+            "source": fixture.user_ids[user],
+            "destination": fixture.user_ids[destination],
+            "comment": "explain",
+            "money": fixture.free_coins[user][0],
+        }
+        yield Check("POST", "/transfer/", admin, scheme)
+
+    if transfers := fixture.transfers["approve_transfer"][user]:
+        yield Check("GET", f"/transfer/{transfers[0]}", user)
+        yield Check("POST", f"/transfer/approve/{transfers[0]}", user)
+
+
+MAX_SORTED_ROWS = 500
+
+
+def find_problems(plan: dict[str, Any], allow_sort: bool) -> Iterator[str]:
+    if plan["Node Type"] == "Seq Scan":
+        yield f"Seq Scan on {plan['Relation Name']}"
+
+    # with sequential scans disabled the planner walks a whole unrelated index instead
+    if plan["Node Type"] in ("Index Scan", "Index Only Scan") and "Filter" in plan and "Index Cond" not in plan:
+        yield f"Full scan of {plan['Index Name']} filtered by {plan['Filter']}"
+
+    # sorting a handful of matching rows is the planner's call, sorting a whole collection for one page is not
+    if plan["Node Type"] in ("Sort", "Incremental Sort") and not allow_sort and plan["Plan Rows"] > MAX_SORTED_ROWS:
+        yield f"{plan['Node Type']} of {plan['Plan Rows']} rows by {', '.join(plan['Sort Key'])}"
+
+    for child in plan.get("Plans", []):
+        yield from find_problems(child, allow_sort)
+
+
+def get_engines() -> list[Engine]:
+    async_engines = [db.async_engine] if db.async_engine is not None else []
+    return [
+        db.engine,
+        *db.replica_engines,
+        *(async_engine.sync_engine for async_engine in async_engines + db.async_replica_engines),
+    ]
+
+
+@pytest.fixture(scope="module")
+def data() -> Fixture:
+    fixture = seed(accounts=100, coins=100000, transfers=1000, reset=True)
+    with db.engine.begin() as connection:
+        connection.execute(text("ANALYZE"))
+
+    return fixture
+
+
+@pytest.fixture(scope="module")
+def captured(data: Fixture) -> list[tuple[Check, list[tuple[str, Any]]]]:
+    """Statements of every check as their engine sent them, the replicas and the async engine included."""
+
+    statements: list[tuple[str, Any]] = []
+
+    def capture(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+        # the export maintenance thread runs beside the requests, its statements belong to no check
+        if statement.lstrip().upper().startswith("SELECT") and current_thread() is not exports.maintenance.thread:
+            statements.append((statement, parameters))
+
+    engines = get_engines()
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", capture)
+
+    captured = []
+    try:
+        with TestClient(app) as client:
+            for check in get_checks(data):
+                statements.clear()
+                response = client.request(check.method, check.url, auth=(check.user, ""), json=check.json)
+                assert response.is_success, (check, response.text)
+                captured.append((check, list(statements)))
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", capture)
+
+    return captured
+
+
+def explain(cursor: Any, statement: str, parameters: Any) -> dict[str, Any]:
+    if isinstance(parameters, dict):
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+    else:
+        # asyncpg statements have numbered $n parameters, which PostgreSQL binds itself in a prepared statement
+        cursor.execute(f"PREPARE explained AS {statement}")
+        try:
+            arguments = f" ({', '.join(['%s'] * len(parameters))})" if parameters else ""
+            cursor.execute(f"EXPLAIN (FORMAT JSON) EXECUTE explained{arguments}", tuple(parameters))
+            return cursor.fetchone()[0][0]["Plan"]
+        finally:
+            cursor.execute("DEALLOCATE explained")
+
+    return cursor.fetchone()[0][0]["Plan"]
+
+
+def test_endpoint_queries_use_indexes(captured: list[tuple[Check, list[tuple[str, Any]]]]) -> None:
+    problems = []
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SET enable_seqscan = off")
+        for check, check_statements in captured:
+            for statement, parameters in check_statements:
+                plan = explain(cursor, statement, parameters)
+                for problem in find_problems(plan, check.allow_sort):
+                    problems.append(f"{check.method} {check.url}: {problem}\n    {' '.join(statement.split())}")
+    finally:
+        connection.close()
+
+    assert not problems, "\n".join(problems)
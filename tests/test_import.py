@@ -0,0 +1,46 @@
+"""Malformed CSV uploads to /money/import are rejected line by line or with a 422, never with a 500."""
+
+from collections.abc import Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from numismatics.app import app
+from numismatics.db import SessionFactory
+from numismatics.db_scheme import create_all, drop_all
+from numismatics.models import Account, Currency, IssuingState, Mint, TypeMoney
+
+HEADER = "description,nominal_price,release_year,serial_number,type_money,currency,mint,issuing_state,user\n"
+USER = ("importer", "")
+
+
+@pytest.fixture(scope="module")
+def client() -> Iterator[TestClient]:
+    drop_all()
+    create_all()
+    with SessionFactory() as session, session.begin():
+        session.add(Account(name=USER[0]))
+        for model in (TypeMoney, Currency, Mint, IssuingState):
+            session.add(model())
+
+    with TestClient(app) as client:
+        yield client
+
+
+def upload(client: TestClient, content: bytes) -> dict:
+    response = client.post("/money/import", auth=USER, files={"file": ("money.csv", content, "text/csv")})
+    return {"status": response.status_code, **response.json()}
+
+
+def test_extra_cells_reject_the_line(client: TestClient) -> None:
+    content = HEADER + "good,1,1999,s1,1,1,1,1,\nextra,1,1999,s2,1,1,1,1,,surplus\n"
+    report = upload(client, content.encode())
+    assert report["status"] == 200
+    assert report["accepted"] == 1 and report["rejected"] == 1
+    assert report["errors"] == [{"line": 3, "error": "ValidationError", "fields": ["extra_cells"]}]
+
+
+def test_non_utf8_file_is_rejected(client: TestClient) -> None:
+    content = (HEADER + "монета,1,1999,s3,1,1,1,1,\n").encode("cp1251")
+    assert upload(client, content) == {"status": 422, "message": "InvalidEncodingError"}
+    assert client.get("/money/?limit=100", auth=USER).json()["items"][-1]["serial_number"] == "s1"
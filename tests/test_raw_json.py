@@ -0,0 +1,49 @@
+"""FAST_RAW_JSON list responses must be byte for byte equal to the pydantic ones."""
+
+from collections.abc import Iterator
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmarks.checks import check_json
+from benchmarks.seed import Fixture, seed
+from numismatics import env
+from numismatics.app import app
+from numismatics.db import SessionFactory
+from numismatics.models import Transfer
+from numismatics.types import StatusTransfer
+
+
+@pytest.fixture(scope="module")
+def data() -> Fixture:
+    fixture = seed(accounts=3, coins=300, transfers=30, reset=True)
+    with SessionFactory() as session, session.begin():
+        # timestamps with and without microseconds are formatted differently
+        for transfer_id in fixture.transfers["approve_transfer"][fixture.users[0]][:2]:
+            session.get(Transfer, transfer_id).created_at = datetime(2020, 1, 2, 3, 4, 5, transfer_id, timezone.utc)
+
+        session.get(Transfer, fixture.transfers["decline_transfer"][fixture.users[0]][0]).created_at = datetime(
+            2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc
+        )
+
+    return fixture
+
+
+@pytest.fixture()
+def raw_json() -> Iterator[None]:
+    yield
+    env.RAW_JSON = False
+
+
+def test_raw_json_matches_pydantic(data: Fixture, raw_json: None) -> None:
+    assert check_json(data) == []
+
+
+def test_transfer_list_covers_timestamps_and_statuses(data: Fixture) -> None:
+    with TestClient(app) as client:
+        items = client.get("/transfer/?limit=1000", auth=(data.admin, "")).json()["items"]
+
+    assert {item["status"] for item in items} == {StatusTransfer.initial.value}
+    assert any(item["created_at"].startswith("2020-01-02T03:04:05.") for item in items)
+    assert any(item["created_at"] in ("2020-01-02T03:04:05", "2020-01-02T03:04:05+00:00") for item in items)